@@ -1,25 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Depends, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne, ASCENDING, DESCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
 from bson import ObjectId
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, monotonic
+import asyncio
+import base64
+import copy
+import csv
+import hashlib
+import io
 import os
+import secrets
 import json
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Dict, Any
 import uuid
+import zlib
 from datetime import datetime, date, time, timezone, timedelta
 from enum import Enum
 import jwt
 import bcrypt
+import numpy as np
+import pandas as pd
 
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
 # MongoDB connection
 mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 client = AsyncIOMotorClient(mongo_url)
@@ -38,6 +57,65 @@ api_router = APIRouter(prefix="/api")
 JWT_SECRET = "maids_secret_key_2024"
 JWT_ALGORITHM = "HS256"
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+# Password hashing pool configuration
+PASSWORD_POOL_SIZE = int(os.getenv("PASSWORD_POOL_SIZE", "4"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+PASSWORD_RETRY_AFTER_SECONDS = int(os.getenv("PASSWORD_RETRY_AFTER_SECONDS", "2"))
+
+# Authenticated user cache configuration
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Stateless (role-bearing) token configuration
+STATELESS_TOKENS_ENABLED = os.getenv("STATELESS_TOKENS", "false").lower() == "true"
+TOKEN_REVOCATION_REFRESH_SECONDS = float(os.getenv("TOKEN_REVOCATION_REFRESH_SECONDS", "5"))
+
+# Refresh token configuration
+REFRESH_TOKEN_TTL_DAYS = int(os.getenv("REFRESH_TOKEN_TTL_DAYS", "30"))
+
+# Admin list pagination
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Service catalog cache configuration
+SERVICE_CATALOG_REFRESH_SECONDS = float(os.getenv("SERVICE_CATALOG_REFRESH_SECONDS", "30"))
+
+# Promo rule cache configuration
+PROMO_RULES_REFRESH_SECONDS = float(os.getenv("PROMO_RULES_REFRESH_SECONDS", "30"))
+
+# How long aggregated promo usage statistics are reused
+PROMO_STATS_TTL_SECONDS = float(os.getenv("PROMO_STATS_TTL_SECONDS", "60"))
+
+# Promo simulator: how long a loaded booking window is reused, and how many windows are kept
+PROMO_SIMULATION_CACHE_SECONDS = float(os.getenv("PROMO_SIMULATION_CACHE_SECONDS", "300"))
+PROMO_SIMULATION_CACHE_SIZE = 4
+
+# Bulk promo campaigns: largest batch per request and codes per insert_many
+MAX_PROMO_CAMPAIGN_SIZE = 100000
+PROMO_CAMPAIGN_CHUNK_SIZE = 1000
+
+# Pricing table reload interval
+PRICING_REFRESH_SECONDS = float(os.getenv("PRICING_REFRESH_SECONDS", "30"))
+
+# Schedule template reload interval
+SCHEDULE_REFRESH_SECONDS = float(os.getenv("SCHEDULE_REFRESH_SECONDS", "30"))
+
+# Longest span /time-slots/range serves in one call, and how long clients may cache it
+MAX_SLOT_RANGE_DAYS = 90
+SLOT_RANGE_MAX_AGE_SECONDS = int(os.getenv("SLOT_RANGE_MAX_AGE_SECONDS", "30"))
+
+# How long a checkout hold keeps a slot's capacity unit
+SLOT_HOLD_TTL_SECONDS = int(os.getenv("SLOT_HOLD_TTL_SECONDS", "600"))
+
+# Hold abuse limits: live holds per client address, and hold requests per address per window
+MAX_SLOT_HOLDS_PER_CLIENT = int(os.getenv("MAX_SLOT_HOLDS_PER_CLIENT", "3"))
+SLOT_HOLD_RATE_LIMIT = int(os.getenv("SLOT_HOLD_RATE_LIMIT", "10"))
+SLOT_HOLD_RATE_WINDOW_SECONDS = int(os.getenv("SLOT_HOLD_RATE_WINDOW_SECONDS", "60"))
+
+# Availability summary resync interval (picks up reservations made by other workers)
+AVAILABILITY_REFRESH_SECONDS = float(os.getenv("AVAILABILITY_REFRESH_SECONDS", "15"))
 
 # Enums
 class BookingStatus(str, Enum):
@@ -118,14 +196,19 @@ class User(BaseModel):
     password_hash: str
     role: UserRole = UserRole.CUSTOMER
     is_active: bool = True
+    token_version: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class AuthResponse(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
     user: dict
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
 # Service Models
 class Service(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -148,6 +231,21 @@ class TimeSlot(BaseModel):
     date: str
     time_slot: str
     is_available: bool = True
+    # None means "one job per active cleaner"
+    capacity: Optional[int] = None
+    reserved: int = 0
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SlotHoldRequest(BaseModel):
+    date: str
+    time_slot: str
+    customer_email: Optional[EmailStr] = None  # identifies guests; signed-in callers hold as themselves
+
+class SlotHold(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    date: str
+    time_slot: str
+    expires_at: datetime
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class Address(BaseModel):
@@ -258,6 +356,21 @@ class CalendarTimeSlot(BaseModel):
     booking_id: Optional[str] = None
 
 # Promo Code Models
+class PromoTier(BaseModel):
+    # Scoped amount at which discount_value replaces the rule's base value
+    min_amount: float
+    discount_value: float
+
+class PromoRule(BaseModel):
+    discount_type: DiscountType
+    discount_value: float
+    # Service ids the rule discounts; empty means the whole order
+    applicable_services: List[str] = []
+    tiers: List[PromoTier] = []
+    maximum_discount_amount: Optional[float] = None
+    # Stackable rules add up; a non-stackable rule only applies if it beats them all
+    stackable: bool = True
+
 class PromoCode(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     code: str
@@ -274,9 +387,22 @@ class PromoCode(BaseModel):
     is_active: bool = True
     applicable_services: List[str] = []
     applicable_customers: List[str] = []
+    # Without rules the code is a single rule built from the fields above
+    rules: List[PromoRule] = []
+    first_booking_only: bool = False
+    campaign_id: Optional[str] = None
+    # Set when a campaign code is edited on its own, so it no longer follows the campaign's rules
+    campaign_override: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class PromoCodeWithStats(PromoCode):
+    redemptions: int = 0
+    unique_customers: int = 0
+    total_discount: float = 0.0
+    # Booking totals (after discount) of the non-cancelled bookings that used the code
+    attributed_revenue: float = 0.0
+
 class PromoCodeUsage(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     promo_code_id: str
@@ -289,6 +415,58 @@ class PromoCodeValidation(BaseModel):
     code: str
     subtotal: float
 
+class PromoSimulationRequest(BaseModel):
+    start: str
+    end: str
+    promo: PromoCode
+    histogram_bins: int = Field(20, ge=1, le=200)
+
+class PromoCampaignRequest(BaseModel):
+    count: int = Field(..., ge=1, le=MAX_PROMO_CAMPAIGN_SIZE)
+    # Codes are prefix + `length` random characters drawn from `alphabet`
+    prefix: str = ""
+    length: int = Field(8, ge=4, le=32)
+    alphabet: str = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+    description: Optional[str] = None
+    discount_type: DiscountType
+    discount_value: float
+    minimum_order_amount: Optional[float] = None
+    maximum_discount_amount: Optional[float] = None
+    usage_limit: Optional[int] = 1
+    usage_limit_per_customer: Optional[int] = 1
+    valid_from: Optional[datetime] = None
+    valid_until: Optional[datetime] = None
+
+# Quote Models
+class QuoteRequest(BaseModel):
+    house_size: HouseSize
+    frequency: ServiceFrequency
+    services: List[BookingService] = []
+    a_la_carte_services: List[BookingService] = []
+    promo_code: Optional[str] = None
+
+class QuoteLineItem(BaseModel):
+    service_id: str
+    service_name: str
+    quantity: int
+    unit_price: float
+    total_price: float
+
+class Quote(BaseModel):
+    house_size: HouseSize
+    frequency: ServiceFrequency
+    base_price: float
+    a_la_carte_items: List[QuoteLineItem] = []
+    a_la_carte_total: float = 0.0
+    subtotal: float
+    promo_code: Optional[str] = None
+    promo_code_id: Optional[str] = None
+    promo_valid: Optional[bool] = None
+    promo_message: Optional[str] = None
+    discount_amount: float = 0.0
+    total_amount: float
+    estimated_duration_hours: int
+
 # Helper Functions
 def prepare_for_mongo(data):
     """Prepare data for MongoDB insertion by converting datetime to ISO strings"""
@@ -308,6 +486,119 @@ def hash_password(password: str) -> str:
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+class PasswordWorkerPool:
+    """Bounded thread pool for bcrypt work so password hashing never blocks the event loop.
+
+    bcrypt releases the GIL while hashing, so a small thread pool gives real
+    parallelism. Once more than ``max_workers + queue_limit`` jobs are in flight
+    new requests are rejected with 503 and a Retry-After header instead of piling up.
+    """
+    def __init__(self, max_workers: int, queue_limit: int, retry_after: int):
+        self.max_workers = max_workers
+        self.queue_limit = queue_limit
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password")
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_seconds = 0.0
+        self.total_hash_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.max_hash_seconds = 0.0
+
+    async def run(self, func, *args):
+        if self.in_flight >= self.max_workers + self.queue_limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Authentication service is busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        
+        def timed_call():
+            started = perf_counter()
+            result = func(*args)
+            return result, started, perf_counter()
+        
+        self.in_flight += 1
+        submitted = perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, started, finished = await loop.run_in_executor(self.executor, timed_call)
+        finally:
+            self.in_flight -= 1
+        
+        wait_seconds = started - submitted
+        hash_seconds = finished - started
+        self.completed += 1
+        self.total_wait_seconds += wait_seconds
+        self.total_hash_seconds += hash_seconds
+        self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+        self.max_hash_seconds = max(self.max_hash_seconds, hash_seconds)
+        return result
+
+    def get_stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "pool_size": self.max_workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_seconds / completed * 1000, 2),
+            "avg_hash_ms": round(self.total_hash_seconds / completed * 1000, 2),
+            "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+            "max_hash_ms": round(self.max_hash_seconds * 1000, 2)
+        }
+
+password_pool = PasswordWorkerPool(PASSWORD_POOL_SIZE, PASSWORD_QUEUE_LIMIT, PASSWORD_RETRY_AFTER_SECONDS)
+
+class RateLimiter:
+    """Fixed-window request counter per client key.
+
+    Counts live in this worker only, so the effective limit scales with the
+    number of workers; it is a brake on scripted abuse, not an exact quota.
+    """
+    def __init__(self, max_requests: int, window_seconds: int):
+        self.max_requests = max_requests
+        self.window_seconds = window_seconds
+        self.windows: Dict[str, List[float]] = {}  # key -> [window_start, count]
+
+    def check(self, key: str):
+        """Count one request for ``key``; 429 with Retry-After once the window is full"""
+        now = monotonic()
+        if len(self.windows) > 10000:
+            self.windows = {k: w for k, w in self.windows.items() if now - w[0] < self.window_seconds}
+        window = self.windows.get(key)
+        if window is None or now - window[0] >= self.window_seconds:
+            self.windows[key] = [now, 1]
+            return
+        if window[1] >= self.max_requests:
+            retry_after = max(1, int(window[0] + self.window_seconds - now) + 1)
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests, please retry shortly",
+                headers={"Retry-After": str(retry_after)}
+            )
+        window[1] += 1
+
+slot_hold_limiter = RateLimiter(SLOT_HOLD_RATE_LIMIT, SLOT_HOLD_RATE_WINDOW_SECONDS)
+
+def client_address(request: Request) -> str:
+    """Caller address, preferring the first X-Forwarded-For hop set by the ingress"""
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded:
+        return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the password worker pool"""
+    return await password_pool.run(hash_password, password)
+
+async def verify_password_async(password: str, hashed: str) -> bool:
+    """Verify a password on the password worker pool"""
+    return await password_pool.run(verify_password, password, hashed)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -318,71 +609,212 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
 
-def get_base_price(house_size: HouseSize, frequency: ServiceFrequency) -> float:
-    """Calculate base price based on house size and frequency"""
+def create_user_access_token(user: dict) -> str:
+    """Create an access token for a user document.
+
+    When STATELESS_TOKENS is enabled the token also carries the claims needed to
+    authorize the request without reading the users collection.
+    """
+    claims = {"sub": user["id"]}
+    if STATELESS_TOKENS_ENABLED:
+        claims.update({
+            "role": user.get("role", UserRole.CUSTOMER.value),
+            "active": user.get("is_active", True),
+            "ver": user.get("token_version", 0),
+            "email": user["email"],
+            "first_name": user["first_name"],
+            "last_name": user["last_name"],
+            "phone": user.get("phone")
+        })
+    return create_access_token(data=claims)
+
+# Pricing tables
+# Pricing and duration rules live in the pricing_tables collection (one document
+# per version) and are compiled into flat lists indexed by enum ordinal.
+HOUSE_SIZES = list(HouseSize)
+SERVICE_FREQUENCIES = list(ServiceFrequency)
+HOUSE_SIZE_INDEX = {size.value: i for i, size in enumerate(HOUSE_SIZES)}
+FREQUENCY_INDEX = {frequency.value: i for i, frequency in enumerate(SERVICE_FREQUENCIES)}
+
+DEFAULT_PRICING_RULES = {
+    "version": 1,
     # Base prices by house size
-    size_prices = {
-        HouseSize.SIZE_1000_1500: 120,
-        HouseSize.SIZE_1500_2000: 150,
-        HouseSize.SIZE_2000_2500: 180,
-        HouseSize.SIZE_2500_3000: 210,
-        HouseSize.SIZE_3000_3500: 240,
-        HouseSize.SIZE_3500_4000: 270,
-        HouseSize.SIZE_4000_4500: 300,
-        HouseSize.SIZE_5000_PLUS: 350
-    }
-    
+    "size_prices": {
+        "1000-1500": 120,
+        "1500-2000": 150,
+        "2000-2500": 180,
+        "2500-3000": 210,
+        "3000-3500": 240,
+        "3500-4000": 270,
+        "4000-4500": 300,
+        "5000+": 350
+    },
     # Frequency multipliers
-    frequency_multipliers = {
-        ServiceFrequency.ONE_TIME: 1.5,
-        ServiceFrequency.MONTHLY: 1.0,
-        ServiceFrequency.EVERY_3_WEEKS: 0.95,
-        ServiceFrequency.BI_WEEKLY: 0.9,
-        ServiceFrequency.WEEKLY: 0.8
-    }
-    
-    base_price = size_prices.get(house_size, 180)
-    multiplier = frequency_multipliers.get(frequency, 1.0)
-    
-    return base_price * multiplier
+    "frequency_multipliers": {
+        "one_time": 1.5,
+        "monthly": 1.0,
+        "every_3_weeks": 0.95,
+        "bi_weekly": 0.9,
+        "weekly": 0.8
+    },
+    # Base duration by house size (in hours)
+    "size_durations": {
+        "1000-1500": 2,
+        "1500-2000": 2.5,
+        "2000-2500": 3,
+        "2500-3000": 3.5,
+        "3000-3500": 4,
+        "3500-4000": 4.5,
+        "4000-4500": 5,
+        "5000+": 6
+    },
+    "a_la_carte_hours_per_service": 0.5,
+    # Add-ons priced by house size band instead of their catalog price
+    "size_tier_rules": [
+        {"service_name": "Dust Baseboards", "max_upper_sqft": 2500, "price_at_or_below": 20.0, "price_above": 30.0}
+    ]
+}
 
-def get_dynamic_a_la_carte_price(service: dict, house_size: str) -> float:
-    """Dynamically adjust price for Dust Baseboards based on house size range.
-       For Dust Baseboards, if the upper bound of the range is <=2500, use $20; otherwise use $30.
-    """
-    if service.get("name", "").lower() == "dust baseboards":
-        # e.g., house_size "2000-2500", "2500-3000", or "5000+"
-        if house_size.endswith("+"):
-            return 30.0
-        parts = house_size.split("-")
-        if len(parts) == 2:
+DEFAULT_SIZE_PRICE = 180
+DEFAULT_SIZE_DURATION = 3
+
+def enum_value(value) -> str:
+    return value.value if isinstance(value, Enum) else value
+
+def house_size_upper_bound(house_size: str) -> float:
+    """Upper square footage of a size band, e.g. 2500 for "2000-2500" and inf for "5000+" """
+    if house_size.endswith("+"):
+        return float("inf")
+    return float(house_size.split("-")[-1])
+
+class PricingTable:
+    """Pricing rules compiled into flat lookup lists indexed by HouseSize/ServiceFrequency ordinals"""
+    def __init__(self, rules: dict):
+        self.rules = {k: v for k, v in rules.items() if k not in ("_id", "created_at")}
+        self.version = rules.get("version", 0)
+        size_prices = rules.get("size_prices", {})
+        multipliers = rules.get("frequency_multipliers", {})
+        durations = rules.get("size_durations", {})
+        
+        self.size_prices = [float(size_prices.get(size.value, DEFAULT_SIZE_PRICE)) for size in HOUSE_SIZES]
+        self.multipliers = [float(multipliers.get(frequency.value, 1.0)) for frequency in SERVICE_FREQUENCIES]
+        self.base_prices = [
+            size_price * multiplier
+            for size_price in self.size_prices
+            for multiplier in self.multipliers
+        ]
+        self.durations = [float(durations.get(size.value, DEFAULT_SIZE_DURATION)) for size in HOUSE_SIZES]
+        self.a_la_carte_hours = float(rules.get("a_la_carte_hours_per_service", 0.5))
+        self.size_tier_prices = {
+            rule["service_name"].lower(): [
+                float(rule["price_at_or_below"]) if house_size_upper_bound(size.value) <= rule["max_upper_sqft"] else float(rule["price_above"])
+                for size in HOUSE_SIZES
+            ]
+            for rule in rules.get("size_tier_rules", [])
+        }
+
+    def base_price(self, house_size, frequency) -> float:
+        size_index = HOUSE_SIZE_INDEX.get(enum_value(house_size))
+        frequency_index = FREQUENCY_INDEX.get(enum_value(frequency))
+        if size_index is None or frequency_index is None:
+            size_price = self.size_prices[size_index] if size_index is not None else DEFAULT_SIZE_PRICE
+            multiplier = self.multipliers[frequency_index] if frequency_index is not None else 1.0
+            return size_price * multiplier
+        return self.base_prices[size_index * len(SERVICE_FREQUENCIES) + frequency_index]
+
+    def base_duration(self, house_size) -> float:
+        size_index = HOUSE_SIZE_INDEX.get(enum_value(house_size))
+        return self.durations[size_index] if size_index is not None else DEFAULT_SIZE_DURATION
+
+    def a_la_carte_price(self, service: dict, house_size) -> Optional[float]:
+        tier_prices = self.size_tier_prices.get(service.get("name", "").lower())
+        size_index = HOUSE_SIZE_INDEX.get(enum_value(house_size))
+        if tier_prices is None or size_index is None:
+            return None
+        return tier_prices[size_index]
+
+    def matrix(self) -> dict:
+        frequency_count = len(SERVICE_FREQUENCIES)
+        return {
+            "version": self.version,
+            "house_sizes": [size.value for size in HOUSE_SIZES],
+            "frequencies": [frequency.value for frequency in SERVICE_FREQUENCIES],
+            "base_prices": [
+                self.base_prices[i * frequency_count:(i + 1) * frequency_count]
+                for i in range(len(HOUSE_SIZES))
+            ],
+            "base_durations": self.durations,
+            "a_la_carte_hours_per_service": self.a_la_carte_hours,
+            "size_tier_prices": self.size_tier_prices
+        }
+
+class PricingRegistry:
+    """Holds the active compiled PricingTable and hot-reloads newer versions from Mongo"""
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.table = PricingTable(DEFAULT_PRICING_RULES)
+
+    async def ensure_loaded(self):
+        # Seed the default table the first time; existing versions are left alone
+        await db.pricing_tables.update_one(
+            {"version": DEFAULT_PRICING_RULES["version"]},
+            {"$setOnInsert": {**DEFAULT_PRICING_RULES, "created_at": datetime.utcnow().isoformat()}},
+            upsert=True
+        )
+        await self.refresh()
+
+    async def refresh(self):
+        latest = await db.pricing_tables.find_one({}, {"_id": 0, "version": 1}, sort=[("version", DESCENDING)])
+        if latest and latest["version"] != self.table.version:
+            rules = await db.pricing_tables.find_one({"version": latest["version"]}, {"_id": 0})
+            self.table = PricingTable(rules)
+            logger.info(f"Loaded pricing table v{self.table.version}")
+
+    async def run_refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
             try:
-                high = int(parts[1])
-                return 20.0 if high <= 2500 else 30.0
-            except ValueError:
-                pass
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Pricing table refresh failed: {e}")
+
+    async def publish(self, rules: dict) -> PricingTable:
+        """Merge ``rules`` over the active table, store it as a new version and activate it.
+
+        Lookup tables (size prices, multipliers, durations) merge per key, so a
+        partial body only changes the entries it names; other fields replace.
+        Raises DuplicateKeyError if another publish took the version first.
+        """
+        merged = dict(self.table.rules)
+        for key, value in rules.items():
+            if isinstance(value, dict) and isinstance(merged.get(key), dict):
+                merged[key] = {**merged[key], **value}
+            else:
+                merged[key] = value
+        latest = await db.pricing_tables.find_one({}, {"_id": 0, "version": 1}, sort=[("version", DESCENDING)])
+        rules = {**merged, "version": (latest["version"] if latest else 0) + 1}
+        table = PricingTable(rules)
+        await db.pricing_tables.insert_one({**rules, "created_at": datetime.utcnow().isoformat()})
+        self.table = table
+        return table
+
+pricing = PricingRegistry(PRICING_REFRESH_SECONDS)
+
+def get_base_price(house_size: HouseSize, frequency: ServiceFrequency) -> float:
+    """Calculate base price based on house size and frequency"""
+    return pricing.table.base_price(house_size, frequency)
+
+def get_dynamic_a_la_carte_price(service: dict, house_size: str) -> float:
+    """Price an add-on for a house size, applying size-banded rules such as Dust Baseboards"""
+    tier_price = pricing.table.a_la_carte_price(service, house_size)
+    if tier_price is not None:
+        return tier_price
     return service.get("a_la_carte_price", 0.0)
 
 def calculate_job_duration(house_size: HouseSize, services: List[BookingService], a_la_carte_services: List[BookingService]) -> int:
     """Calculate estimated job duration in hours"""
-    # Base duration by house size (in hours)
-    size_durations = {
-        HouseSize.SIZE_1000_1500: 2,
-        HouseSize.SIZE_1500_2000: 2.5,
-        HouseSize.SIZE_2000_2500: 3,
-        HouseSize.SIZE_2500_3000: 3.5,
-        HouseSize.SIZE_3000_3500: 4,
-        HouseSize.SIZE_3500_4000: 4.5,
-        HouseSize.SIZE_4000_4500: 5,
-        HouseSize.SIZE_5000_PLUS: 6
-    }
-    
-    base_duration = size_durations.get(house_size, 3)
-    
-    # Add time for a la carte services (0.5 hour per service)
-    additional_duration = len(a_la_carte_services) * 0.5
-    
-    total_duration = base_duration + additional_duration
+    table = pricing.table
+    total_duration = table.base_duration(house_size) + len(a_la_carte_services) * table.a_la_carte_hours
     
     # Round up to nearest hour
     return int(total_duration) if total_duration == int(total_duration) else int(total_duration) + 1
@@ -404,77 +836,525 @@ def calculate_discount(promo: PromoCode, subtotal: float) -> float:
     # Round to 2 decimal places
     return round(discount, 2)
 
-async def validate_promo_code(code: str, customer_id: str, subtotal: float) -> dict:
-    """Comprehensive promo code validation with security checks"""
-    # 1. Basic validation
+# Promo rule cache
+class PromoRuleEvaluator:
+    """One PromoRule with its tiers pre-sorted, applied to the amount in its scope"""
+    def __init__(self, rule: PromoRule):
+        self.rule = rule
+        self.services = frozenset(rule.applicable_services)
+        self.tiers = sorted(((tier.min_amount, tier.discount_value) for tier in rule.tiers), reverse=True)
+
+    def discount(self, amount: float) -> float:
+        if amount <= 0:
+            return 0.0
+        value = next((value for min_amount, value in self.tiers if amount >= min_amount), self.rule.discount_value)
+        if self.rule.discount_type == DiscountType.PERCENTAGE:
+            discount = amount * value / 100
+        else:
+            discount = value
+        if self.rule.maximum_discount_amount:
+            discount = min(discount, self.rule.maximum_discount_amount)
+        return min(discount, amount)
+
+class CompiledPromo:
+    """A promo code parsed into a PromoCode once, with its JSON form and rule evaluators precomputed"""
+    def __init__(self, doc: dict):
+        self.promo = PromoCode(**clean_object_for_json({k: v for k, v in doc.items() if k != "_id"}))
+        self.public = clean_object_for_json(self.promo.dict())
+        self.applicable_customers = frozenset(self.promo.applicable_customers)
+        
+        rules = self.promo.rules or [PromoRule(
+            discount_type=self.promo.discount_type,
+            discount_value=self.promo.discount_value,
+            applicable_services=self.promo.applicable_services
+        )]
+        self.evaluators = [PromoRuleEvaluator(rule) for rule in rules]
+        # service id -> evaluators scoped to it, so each line item is matched with set lookups
+        self.whole_order = [index for index, evaluator in enumerate(self.evaluators) if not evaluator.services]
+        self.by_service: Dict[str, List[int]] = {}
+        for index, evaluator in enumerate(self.evaluators):
+            for service_id in evaluator.services:
+                self.by_service.setdefault(service_id, []).append(index)
+        self.service_scoped = len(self.whole_order) < len(self.evaluators)
+
+    def for_code(self, promo_id: str, code: str, usage_count: int) -> "CompiledPromo":
+        """This rule set under another code's identity; campaign codes share one compiled template"""
+        compiled = copy.copy(self)
+        identity = {"id": promo_id, "code": code, "usage_count": usage_count}
+        compiled.promo = self.promo.copy(update=identity)
+        compiled.public = {**self.public, **identity}
+        return compiled
+
+    def discount(self, lines: List[tuple], subtotal: float) -> float:
+        """Discount for priced lines of (service ids, amount), in one pass over the lines.
+
+        Stackable rules sum; the best non-stackable rule wins instead if it is
+        larger. The code-level maximum and the subtotal cap the result.
+        """
+        scoped_amounts = [0.0] * len(self.evaluators)
+        for service_ids, amount in lines:
+            matched = set(self.whole_order)
+            for service_id in service_ids:
+                matched.update(self.by_service.get(service_id, ()))
+            for index in matched:
+                scoped_amounts[index] += amount
+        
+        stacked, exclusive = 0.0, 0.0
+        for evaluator, amount in zip(self.evaluators, scoped_amounts):
+            discount = evaluator.discount(amount)
+            if evaluator.rule.stackable:
+                stacked += discount
+            else:
+                exclusive = max(exclusive, discount)
+        discount = max(stacked, exclusive)
+        
+        if self.promo.maximum_discount_amount:
+            discount = min(discount, self.promo.maximum_discount_amount)
+        return round(min(discount, subtotal), 2)
+
+    def rejection(self, customer_id: Optional[str], subtotal: float, now: datetime) -> Optional[str]:
+        """Reason the code cannot be used for this order, or None; skips per-customer usage.
+
+        With no customer (an anonymous quote) the customer allow-list is not checked.
+        """
+        promo = self.promo
+        if not promo.is_active:
+            return "Promo code is not active"
+        if promo.valid_from and now < promo.valid_from.replace(tzinfo=None):
+            return "Promo code is not yet valid"
+        if promo.valid_until and now > promo.valid_until.replace(tzinfo=None):
+            return "Promo code has expired"
+        if promo.usage_limit and promo.usage_count >= promo.usage_limit:
+            return "Promo code usage limit reached"
+        if promo.minimum_order_amount and subtotal < promo.minimum_order_amount:
+            return f"Minimum order amount of ${promo.minimum_order_amount} required"
+        if customer_id is not None and self.applicable_customers and customer_id not in self.applicable_customers:
+            return "Promo code not applicable to your account"
+        return None
+
+class PromoRuleCache:
+    """Process-wide map of promo code -> CompiledPromo.
+
+    Versioned through app_metadata like the service catalog: the admin promo
+    endpoints bump the version, and each process re-checks it at most every
+    ``refresh_seconds``. Redemptions in this process update usage_count in
+    place; the authoritative limit check happens at redemption time.
+
+    Bulk campaign codes all carry the same rules, stored once on the
+    campaign's promo_campaigns document, so each campaign compiles once into
+    a template and its codes are kept as a small
+    code -> [campaign id, promo id, usage_count] index. A campaign code
+    edited on its own (campaign_override) is compiled individually like any
+    other code.
+    """
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[int] = None
+        self.by_code: Dict[str, CompiledPromo] = {}
+        self.by_id: Dict[str, CompiledPromo] = {}
+        self.campaigns: Dict[str, CompiledPromo] = {}
+        self.campaign_codes: Dict[str, list] = {}
+        self.campaign_code_by_id: Dict[str, str] = {}
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def compile_into(by_code: Dict[str, CompiledPromo], doc: dict):
+        try:
+            by_code[doc["code"]] = CompiledPromo(doc)
+        except Exception as e:
+            logger.warning(f"Skipping malformed promo code {doc.get('code')}: {e}")
+
+    async def load(self, version: int):
+        by_code = {}
+        async for doc in db.promo_codes.find(
+            {"$or": [{"campaign_id": None}, {"campaign_override": True}]}, {"_id": 0}
+        ):
+            self.compile_into(by_code, doc)
+        
+        campaigns = {}
+        async for campaign in db.promo_campaigns.find({}, {"_id": 0, "id": 1, "rules": 1}):
+            try:
+                campaigns[campaign["id"]] = CompiledPromo(campaign["rules"])
+            except Exception as e:
+                logger.warning(f"Skipping malformed promo campaign {campaign['id']}: {e}")
+        
+        campaign_codes = {}
+        orphan_ids = []
+        async for doc in db.promo_codes.find(
+            {"campaign_id": {"$ne": None}, "campaign_override": {"$ne": True}},
+            {"_id": 0, "id": 1, "code": 1, "campaign_id": 1, "usage_count": 1}
+        ):
+            if doc["campaign_id"] in campaigns:
+                campaign_codes[doc["code"]] = [doc["campaign_id"], doc["id"], doc.get("usage_count", 0)]
+            else:
+                orphan_ids.append(doc["id"])
+        # Codes whose campaign has no rules document fall back to their own fields
+        if orphan_ids:
+            async for doc in db.promo_codes.find({"id": {"$in": orphan_ids}}, {"_id": 0}):
+                self.compile_into(by_code, doc)
+        
+        self.by_code = by_code
+        self.by_id = {rule.promo.id: rule for rule in by_code.values()}
+        self.campaigns = campaigns
+        self.campaign_codes = campaign_codes
+        self.campaign_code_by_id = {entry[1]: code for code, entry in campaign_codes.items()}
+        self.version = version
+
+    async def snapshot(self) -> "PromoRuleCache":
+        if self.version is None or monotonic() - self.checked_at >= self.refresh_seconds:
+            async with self.lock:
+                if self.version is None or monotonic() - self.checked_at >= self.refresh_seconds:
+                    meta = await db.app_metadata.find_one({"_id": "promo_codes"})
+                    version = meta.get("version", 0) if meta else 0
+                    if version != self.version:
+                        await self.load(version)
+                    self.checked_at = monotonic()
+        return self
+
+    async def bump_version(self):
+        meta = await db.app_metadata.find_one_and_update(
+            {"_id": "promo_codes"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        async with self.lock:
+            await self.load(meta["version"])
+            self.checked_at = monotonic()
+
+    def get(self, code: str) -> Optional[CompiledPromo]:
+        code = code.upper()
+        rule = self.by_code.get(code)
+        if rule is not None:
+            return rule
+        entry = self.campaign_codes.get(code)
+        if entry is None:
+            return None
+        campaign_id, promo_id, usage_count = entry
+        return self.campaigns[campaign_id].for_code(promo_id, code, usage_count)
+
+    def code_count(self) -> int:
+        return len(self.by_code) + len(self.campaign_codes)
+
+    def record_redemption(self, promo_code_id: str):
+        rule = self.by_id.get(promo_code_id)
+        if rule is not None:
+            rule.promo.usage_count += 1
+            return
+        code = self.campaign_code_by_id.get(promo_code_id)
+        if code is not None:
+            self.campaign_codes[code][2] += 1
+
+promo_rules = PromoRuleCache(PROMO_RULES_REFRESH_SECONDS)
+
+def promo_usage_key(promo_code_id: str, customer_id: str) -> str:
+    return f"{promo_code_id}:{customer_id}"
+
+async def get_customer_promo_usage(promo_code_id: str, customer_id: str) -> int:
+    """Times a customer has redeemed a promo, from the promo_customer_usage counters"""
+    counter = await db.promo_customer_usage.find_one(
+        {"_id": promo_usage_key(promo_code_id, customer_id)}, {"count": 1}
+    )
+    return counter.get("count", 0) if counter else 0
+
+async def redeem_promo_code(promo_code_id: str, customer_id: str, booking_id: str) -> Optional[str]:
+    """Atomically count one redemption against both usage limits; the rejection reason or None.
+
+    The global limit is a conditional increment on the promo document; the
+    per-customer limit is a conditional upsert on the customer's counter,
+    whose _id is unique per promo + customer, so a customer at the limit
+    fails the filter and the upsert collides instead of inserting a second
+    counter (a collision from a racing first redemption is retried once).
+    First-booking-only codes must also claim the customer's first-booking
+    marker for this booking. Any rejection hands the units taken back.
+    """
+    promo = await db.promo_codes.find_one_and_update(
+        {
+            "id": promo_code_id,
+            "$expr": {"$or": [
+                {"$lte": [{"$ifNull": ["$usage_limit", 0]}, 0]},
+                {"$lt": [{"$ifNull": ["$usage_count", 0]}, "$usage_limit"]}
+            ]}
+        },
+        {"$inc": {"usage_count": 1}},
+        projection={"_id": 0, "usage_limit_per_customer": 1, "first_booking_only": 1}
+    )
+    if promo is None:
+        return "Promo code usage limit reached"
+    
+    usage_limit_per_customer = promo.get("usage_limit_per_customer")
+    counter_filter = {"_id": promo_usage_key(promo_code_id, customer_id)}
+    if usage_limit_per_customer:
+        counter_filter["count"] = {"$lt": usage_limit_per_customer}
+    counted = False
+    for _ in range(2):
+        try:
+            await db.promo_customer_usage.update_one(
+                counter_filter,
+                {"$inc": {"count": 1}, "$setOnInsert": {"promo_code_id": promo_code_id, "customer_id": customer_id}},
+                upsert=True
+            )
+            counted = True
+            break
+        except DuplicateKeyError:
+            # Either a racing first redemption created the counter, or the customer is at the limit
+            continue
+    if not counted:
+        await db.promo_codes.update_one({"id": promo_code_id}, {"$inc": {"usage_count": -1}})
+        return "You have already used this promo code"
+    
+    if promo.get("first_booking_only") and not await claim_first_booking(customer_id, booking_id):
+        await refund_promo_redemption(promo_code_id, customer_id)
+        return "Promo code is only valid on your first booking"
+    promo_rules.record_redemption(promo_code_id)
+    return None
+
+# First-booking markers: one per customer, naming the booking that came first
+async def claim_first_booking(customer_id: str, booking_id: str) -> bool:
+    """Record this booking as the customer's first; False if they already have one"""
+    try:
+        await db.first_bookings.insert_one({"_id": customer_id, "booking_id": booking_id})
+        return True
+    except DuplicateKeyError:
+        return False
+
+async def mark_first_booking(customer_id: str, booking_id: str):
+    """Record this booking as the customer's first unless one already is"""
+    try:
+        await db.first_bookings.update_one(
+            {"_id": customer_id}, {"$setOnInsert": {"booking_id": booking_id}}, upsert=True
+        )
+    except DuplicateKeyError:
+        pass  # a racing booking got there first
+
+async def release_first_booking(customer_id: str, booking_id: str):
+    """Forget the marker if it names this booking, e.g. once it is cancelled"""
+    await db.first_bookings.delete_one({"_id": customer_id, "booking_id": booking_id})
+
+async def refund_promo_redemption(promo_code_id: str, customer_id: str):
+    """Undo redeem_promo_code when the booking it was for could not be saved"""
+    await db.promo_codes.update_one({"id": promo_code_id}, {"$inc": {"usage_count": -1}})
+    await db.promo_customer_usage.update_one(
+        {"_id": promo_usage_key(promo_code_id, customer_id)},
+        {"$inc": {"count": -1}}
+    )
+
+async def validate_promo_code(code: str, customer_id: Optional[str], subtotal: float, lines: Optional[List[tuple]] = None) -> dict:
+    """Comprehensive promo code validation with security checks.
+
+    Rules come from the in-memory promo cache; the customer's usage counter
+    (and prior bookings, for first-booking-only codes) are read only after
+    every in-memory check has passed. ``lines`` are the order's priced
+    (service ids, amount) items; without them the subtotal is one unscoped
+    line, and service-scoped codes are rejected since they cannot be priced.
+
+    With no customer_id nothing customer-specific is checked or revealed; a
+    code with per-customer conditions comes back valid with a note that it
+    is confirmed at booking, where create_booking_internal checks it.
+    """
     if not code or len(code.strip()) == 0:
         return {"valid": False, "message": "Promo code is required"}
     
-    # 2. Database lookup
-    promo = await db.promo_codes.find_one({"code": code.upper()})
-    if not promo:
+    rules = await promo_rules.snapshot()
+    rule = rules.get(code)
+    if rule is None:
         return {"valid": False, "message": "Invalid promo code"}
     
-    # 3. Active status check
-    if not promo.get("is_active", False):
-        return {"valid": False, "message": "Promo code is not active"}
-    
-    # 4. Date validation
-    now = datetime.utcnow()
-    if promo.get("valid_from") and now < promo["valid_from"]:
-        return {"valid": False, "message": "Promo code is not yet valid"}
+    rejection = rule.rejection(customer_id, subtotal, datetime.utcnow())
+    if rejection:
+        return {"valid": False, "message": rejection}
     
-    if promo.get("valid_until") and now > promo["valid_until"]:
-        return {"valid": False, "message": "Promo code has expired"}
+    usage_limit_per_customer = rule.promo.usage_limit_per_customer
+    if customer_id is not None and usage_limit_per_customer:
+        customer_usage = await get_customer_promo_usage(rule.promo.id, customer_id)
+        if customer_usage >= usage_limit_per_customer:
+            return {"valid": False, "message": "You have already used this promo code"}
     
-    # 5. Usage limit validation
-    if promo.get("usage_limit") and promo.get("usage_count", 0) >= promo["usage_limit"]:
-        return {"valid": False, "message": "Promo code usage limit reached"}
+    if rule.promo.first_booking_only and customer_id is not None:
+        prior_booking = await db.bookings.find_one(
+            {"customer_id": customer_id, "status": {"$ne": BookingStatus.CANCELLED.value}}, {"_id": 1}
+        )
+        if prior_booking:
+            return {"valid": False, "message": "Promo code is only valid on your first booking"}
     
-    # 6. Customer usage limit validation
-    customer_usage = await db.promo_code_usage.count_documents({
-        "customer_id": customer_id,
-        "promo_code_id": promo["id"]
-    })
-    usage_limit_per_customer = promo.get("usage_limit_per_customer", 1)
-    if usage_limit_per_customer and customer_usage >= usage_limit_per_customer:
-        return {"valid": False, "message": "You have already used this promo code"}
-    
-    # 7. Minimum order amount validation
-    if promo.get("minimum_order_amount") and subtotal < promo["minimum_order_amount"]:
-        return {"valid": False, "message": f"Minimum order amount of ${promo['minimum_order_amount']} required"}
-    
-    # 8. Customer applicability validation
-    if promo.get("applicable_customers") and customer_id not in promo["applicable_customers"]:
-        return {"valid": False, "message": "Promo code not applicable to your account"}
-    
-    # 9. Calculate discount
-    # First clean the promo data before creating Pydantic model
-    promo_clean = clean_object_for_json(promo)
-    promo_obj = PromoCode(**promo_clean)
-    discount = calculate_discount(promo_obj, subtotal)
-
-    # Create response with manual serialization
-    response_data = {
+    if lines is None and rule.service_scoped:
+        return {"valid": False, "message": "Promo code applies to specific services; request a quote to see the discount"}
+    discount = rule.discount(lines if lines is not None else [((), subtotal)], subtotal)
+    if rule.service_scoped and discount <= 0:
+        return {"valid": False, "message": "Promo code does not apply to the selected services"}
+    result = {
         "valid": True,
-        "promo": promo_clean,
+        "promo": rule.public,
         "discount": float(discount),
         "final_amount": float(subtotal - discount)
     }
-    
-    # Double-check for any remaining ObjectIds
-    def final_clean(obj):
-        if isinstance(obj, ObjectId):
-            return str(obj)
-        elif isinstance(obj, dict):
-            return {k: final_clean(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [final_clean(item) for item in obj]
+    if customer_id is None and (usage_limit_per_customer or rule.promo.first_booking_only or rule.applicable_customers):
+        result["message"] = "Promo code eligibility is confirmed when you book"
+    return result
+
+class PrincipalCache:
+    """Bounded LRU + TTL cache of authenticated users keyed by user id.
+
+    Entries expire after ``ttl_seconds`` so changes made outside this process
+    still propagate; writes in this process call ``invalidate`` directly.
+    """
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id: str) -> Optional[User]:
+        entry = self.entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        user, expires_at = entry
+        if expires_at <= monotonic():
+            del self.entries[user_id]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(user_id)
+        self.hits += 1
+        return user
+
+    def put(self, user: User):
+        self.entries[user.id] = (user, monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(user.id)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, user_id: str):
+        if self.entries.pop(user_id, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
+
+user_cache = PrincipalCache(USER_CACHE_SIZE, USER_CACHE_TTL_SECONDS)
+
+def invalidate_user_cache(user_id: str):
+    """Drop a cached principal after its role, status or profile changes"""
+    user_cache.invalidate(user_id)
+
+def hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+async def issue_refresh_token(user_id: str, family_id: Optional[str] = None) -> str:
+    """Create and store a new refresh token; only its SHA-256 hash is persisted"""
+    token = secrets.token_urlsafe(48)
+    now = datetime.utcnow()
+    await db.refresh_tokens.insert_one({
+        "id": str(uuid.uuid4()),
+        "family_id": family_id or str(uuid.uuid4()),
+        "user_id": user_id,
+        "token_hash": hash_refresh_token(token),
+        "revoked": False,
+        "created_at": now,
+        # Stored as a native date so the TTL index can expire it
+        "expires_at": now + timedelta(days=REFRESH_TOKEN_TTL_DAYS)
+    })
+    return token
+
+class TokenRevocationTable:
+    """In-memory view of token versions and deactivated users.
+
+    Only users whose token_version was bumped or who are deactivated are
+    held, so the table stays small; the query is served by the sparse
+    token_version index and the partial is_active=false index, so users
+    deactivated by scripts or other paths that skip update_user are still
+    picked up. It is reloaded from Mongo every ``refresh_seconds`` and
+    updated immediately for changes made in this process.
+    """
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.token_versions: Dict[str, int] = {}
+        self.inactive_users: set = set()
+        self.last_refreshed: Optional[datetime] = None
+        self.refresh_count = 0
+
+    async def refresh(self):
+        users = await db.users.find(
+            {"$or": [{"token_version": {"$gt": 0}}, {"is_active": False}]},
+            {"_id": 0, "id": 1, "token_version": 1, "is_active": 1}
+        ).to_list(None)
+        self.token_versions = {user["id"]: user.get("token_version", 0) for user in users}
+        self.inactive_users = {user["id"] for user in users if user.get("is_active") is False}
+        self.last_refreshed = datetime.utcnow()
+        self.refresh_count += 1
+
+    async def run_refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Token revocation refresh failed: {e}")
+            await asyncio.sleep(self.refresh_seconds)
+
+    def record_user(self, user_id: str, token_version: int, is_active: bool):
+        self.token_versions[user_id] = token_version
+        if is_active:
+            self.inactive_users.discard(user_id)
         else:
-            return obj
-    
-    response_data = final_clean(response_data)
-    return response_data
+            self.inactive_users.add(user_id)
+
+    def is_revoked(self, user_id: str, token_version: int) -> bool:
+        if user_id in self.inactive_users:
+            return True
+        return token_version < self.token_versions.get(user_id, 0)
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": STATELESS_TOKENS_ENABLED,
+            "tracked_users": len(self.token_versions),
+            "inactive_users": len(self.inactive_users),
+            "refresh_seconds": self.refresh_seconds,
+            "refresh_count": self.refresh_count,
+            "last_refreshed": self.last_refreshed.isoformat() if self.last_refreshed else None
+        }
+
+token_revocations = TokenRevocationTable(TOKEN_REVOCATION_REFRESH_SECONDS)
+
+def user_from_token_claims(payload: dict) -> Optional[User]:
+    """Build a User from a stateless token, or None to look the user up instead.
+
+    Claims are only trusted while STATELESS_TOKENS is on, since the
+    revocation table is not kept fresh otherwise.
+    """
+    if not STATELESS_TOKENS_ENABLED or "role" not in payload or "ver" not in payload:
+        return None
+    if not payload.get("active", True) or token_revocations.is_revoked(payload["sub"], payload["ver"]):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
+    return User(
+        id=payload["sub"],
+        email=payload["email"],
+        first_name=payload["first_name"],
+        last_name=payload["last_name"],
+        phone=payload.get("phone"),
+        password_hash="",
+        role=payload["role"],
+        is_active=payload["active"],
+        token_version=payload["ver"]
+    )
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     try:
@@ -486,17 +1366,169 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid authentication credentials")
     
+    # Stateless tokens authorize without touching the users collection
+    token_user = user_from_token_claims(payload)
+    if token_user is not None:
+        return token_user
+    
+    cached_user = user_cache.get(user_id)
+    if cached_user is not None:
+        return cached_user
+    
     user = await db.users.find_one({"id": user_id})
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     
-    return User(**user)
+    current_user = User(**user)
+    user_cache.put(current_user)
+    return current_user
+
+async def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)) -> Optional[User]:
+    """Resolve the caller if a bearer token was sent, otherwise None (guest)"""
+    if credentials is None:
+        return None
+    return await get_current_user(credentials)
 
 async def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
     if current_user.role != UserRole.ADMIN:
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
+# Keyset pagination
+class PageParams:
+    """Query parameters for keyset-paginated admin lists.
+
+    One page of ``limit`` rows (DEFAULT_PAGE_SIZE unless given) is returned
+    and, if more rows exist, an opaque cursor for the next page is sent in
+    the ``X-Next-Cursor`` response header. Pass ``include_total=true`` to
+    also get ``X-Total-Count``.
+    """
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        after: Optional[str] = Query(None, description="Cursor from a previous X-Next-Cursor header"),
+        include_total: bool = False
+    ):
+        self.limit = limit
+        self.after = after
+        self.include_total = include_total
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    payload = json.dumps([doc.get(sort_field), doc["id"]], cls=ObjectIdEncoder)
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('utf-8')
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        value, last_id = json.loads(base64.urlsafe_b64decode(cursor.encode('utf-8')))
+        return [value, last_id]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+async def fetch_page(
+    collection,
+    query: dict,
+    page: PageParams,
+    response: Response,
+    sort_field: str = "created_at",
+    direction: int = DESCENDING
+) -> List[dict]:
+    """Fetch one page of ``collection`` ordered by (sort_field, id)"""
+    sort = [(sort_field, direction), ("id", direction)]
+    page_query = query
+    if page.after:
+        value, last_id = decode_cursor(page.after)
+        op = "$lt" if direction == DESCENDING else "$gt"
+        page_query = {"$and": [query, {"$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "id": {op: last_id}}
+        ]}]}
+    
+    if page.include_total:
+        response.headers["X-Total-Count"] = str(await collection.count_documents(query))
+    
+    docs = await collection.find(page_query).sort(sort).limit(page.limit + 1).to_list(page.limit + 1)
+    if len(docs) > page.limit:
+        docs = docs[:page.limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1], sort_field)
+    return docs
+
+# Streaming CSV export
+EXPORT_FLUSH_BYTES = 64 * 1024
+
+# The json export format builds rows in memory, so it is capped; csv/gzip stream everything
+EXPORT_JSON_ROW_LIMIT = 1000
+
+BOOKING_EXPORT_COLUMNS = [
+    ("ID", "id"),
+    ("Customer ID", "customer_id"),
+    ("Date", "booking_date"),
+    ("Time", "time_slot"),
+    ("House Size", "house_size"),
+    ("Frequency", "frequency"),
+    ("Amount", "total_amount"),
+    ("Status", "status"),
+    ("Cleaner", "cleaner_id"),
+    ("Created", "created_at")
+]
+
+REPORT_EXPORT_COLUMNS = [
+    ("booking_id", "id"),
+    ("customer_id", "customer_id"),
+    ("booking_date", "booking_date"),
+    ("time_slot", "time_slot"),
+    ("house_size", "house_size"),
+    ("frequency", "frequency"),
+    ("total_amount", "total_amount"),
+    ("status", "status"),
+    ("cleaner_id", "cleaner_id"),
+    ("created_at", "created_at")
+]
+
+def export_projection(columns: list) -> dict:
+    projection = {field: 1 for _, field in columns}
+    projection["_id"] = 0
+    return projection
+
+async def stream_csv_rows(cursor, columns: list, compress: bool = False):
+    """Yield CSV (optionally gzip) chunks as rows arrive from a Mongo cursor.
+
+    Rows are buffered only up to EXPORT_FLUSH_BYTES, so memory use is constant
+    regardless of how many documents the cursor returns.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    
+    def drain() -> bytes:
+        data = buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate(0)
+        return compressor.compress(data) if compressor else data
+    
+    writer.writerow([header for header, _ in columns])
+    async for doc in cursor:
+        writer.writerow([doc.get(field, "") for _, field in columns])
+        if buffer.tell() >= EXPORT_FLUSH_BYTES:
+            chunk = drain()
+            if chunk:
+                yield chunk
+    
+    chunk = drain()
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+def csv_export_response(cursor, columns: list, filename: str, export_format: str) -> StreamingResponse:
+    compress = export_format == "gzip"
+    if compress:
+        filename += ".gz"
+    return StreamingResponse(
+        stream_csv_rows(cursor, columns, compress=compress),
+        media_type="application/gzip" if compress else "text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -504,6 +1536,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Total-Count", "Content-Disposition"],
 )
 
 # Auth endpoints
@@ -520,14 +1553,15 @@ async def register(user_data: UserRegister):
         first_name=user_data.first_name,
         last_name=user_data.last_name,
         phone=user_data.phone,
-        password_hash=hash_password(user_data.password)
+        password_hash=await hash_password_async(user_data.password)
     )
     
     user_dict = prepare_for_mongo(user.dict())
     await db.users.insert_one(user_dict)
     
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_user_access_token(user.dict())
+    refresh_token = await issue_refresh_token(user.id)
     
     # Return user data without password
     user_response = {
@@ -539,7 +1573,7 @@ async def register(user_data: UserRegister):
         "role": user.role
     }
     
-    return AuthResponse(access_token=access_token, user=user_response)
+    return AuthResponse(access_token=access_token, refresh_token=refresh_token, user=user_response)
 
 @api_router.post("/auth/login", response_model=AuthResponse)
 async def login(user_data: UserLogin):
@@ -549,11 +1583,12 @@ async def login(user_data: UserLogin):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Verify password
-    if not verify_password(user_data.password, user["password_hash"]):
+    if not await verify_password_async(user_data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
     # Create access token
-    access_token = create_access_token(data={"sub": user["id"]})
+    access_token = create_user_access_token(user)
+    refresh_token = await issue_refresh_token(user["id"])
     
     # Return user data without password
     user_response = {
@@ -565,7 +1600,61 @@ async def login(user_data: UserLogin):
         "role": user.get("role", "customer")
     }
     
-    return AuthResponse(access_token=access_token, user=user_response)
+    return AuthResponse(access_token=access_token, refresh_token=refresh_token, user=user_response)
+
+@api_router.post("/auth/refresh", response_model=AuthResponse)
+async def refresh_access_token(refresh_data: RefreshTokenRequest):
+    """Exchange a refresh token for a new access token and a rotated refresh token"""
+    token_hash = hash_refresh_token(refresh_data.refresh_token)
+    now = datetime.utcnow()
+    
+    # Atomically consume the token so concurrent refreshes cannot both succeed
+    stored_token = await db.refresh_tokens.find_one_and_update(
+        {"token_hash": token_hash, "revoked": False},
+        {"$set": {"revoked": True, "rotated_at": now}}
+    )
+    if not stored_token:
+        # A known but already rotated token means it was stolen or replayed
+        reused_token = await db.refresh_tokens.find_one({"token_hash": token_hash})
+        if reused_token:
+            await db.refresh_tokens.update_many(
+                {"family_id": reused_token["family_id"]},
+                {"$set": {"revoked": True}}
+            )
+            logger.warning(f"Refresh token reuse detected for user {reused_token['user_id']}")
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    if stored_token["expires_at"] <= now:
+        raise HTTPException(status_code=401, detail="Refresh token has expired")
+    
+    user = await db.users.find_one({"id": stored_token["user_id"]})
+    if not user or not user.get("is_active", True):
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    access_token = create_user_access_token(user)
+    refresh_token = await issue_refresh_token(user["id"], stored_token["family_id"])
+    
+    user_response = {
+        "id": user["id"],
+        "email": user["email"],
+        "first_name": user["first_name"],
+        "last_name": user["last_name"],
+        "phone": user.get("phone"),
+        "role": user.get("role", "customer")
+    }
+    
+    return AuthResponse(access_token=access_token, refresh_token=refresh_token, user=user_response)
+
+@api_router.post("/auth/logout")
+async def logout(refresh_data: RefreshTokenRequest):
+    """Revoke a refresh token and every token rotated from it"""
+    stored_token = await db.refresh_tokens.find_one({"token_hash": hash_refresh_token(refresh_data.refresh_token)})
+    if stored_token:
+        await db.refresh_tokens.update_many(
+            {"family_id": stored_token["family_id"]},
+            {"$set": {"revoked": True}}
+        )
+    return {"message": "Logged out successfully"}
 
 @api_router.get("/auth/me")
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
@@ -612,15 +1701,71 @@ class ObjectIdEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-@api_router.get("/admin/promo-codes", response_model=List[PromoCode])
-async def get_promo_codes(admin_user: User = Depends(get_admin_user)):
+class PromoUsageStats:
+    """Per-promo usage statistics from one aggregation, reused for ``ttl_seconds``.
+
+    Groups promo_code_usage by promo_code_id, joining each redemption to its
+    booking for attributed revenue.
+    """
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self.by_promo: Dict[str, dict] = {}
+        self.computed_at: Optional[float] = None
+        self.lock = asyncio.Lock()
+
+    async def compute(self) -> Dict[str, dict]:
+        rows = await db.promo_code_usage.aggregate([
+            {"$lookup": {
+                "from": "bookings",
+                "localField": "booking_id",
+                "foreignField": "id",
+                "as": "booking"
+            }},
+            {"$unwind": {"path": "$booking", "preserveNullAndEmptyArrays": True}},
+            {"$group": {
+                "_id": "$promo_code_id",
+                "redemptions": {"$sum": 1},
+                "customers": {"$addToSet": "$customer_id"},
+                "total_discount": {"$sum": "$discount_amount"},
+                "attributed_revenue": {"$sum": {"$cond": [
+                    {"$eq": ["$booking.status", BookingStatus.CANCELLED.value]},
+                    0,
+                    {"$ifNull": ["$booking.total_amount", 0]}
+                ]}}
+            }},
+            {"$project": {
+                "redemptions": 1,
+                "unique_customers": {"$size": "$customers"},
+                "total_discount": {"$round": ["$total_discount", 2]},
+                "attributed_revenue": {"$round": ["$attributed_revenue", 2]}
+            }}
+        ]).to_list(None)
+        return {row.pop("_id"): row for row in rows}
+
+    async def get(self) -> Dict[str, dict]:
+        if self.computed_at is None or monotonic() - self.computed_at >= self.ttl_seconds:
+            async with self.lock:
+                if self.computed_at is None or monotonic() - self.computed_at >= self.ttl_seconds:
+                    self.by_promo = await self.compute()
+                    self.computed_at = monotonic()
+        return self.by_promo
+
+promo_usage_stats = PromoUsageStats(PROMO_STATS_TTL_SECONDS)
+
+@api_router.get("/admin/promo-codes", response_model=List[PromoCodeWithStats])
+async def get_promo_codes(
+    response: Response,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(get_admin_user)
+):
     """Get all promo codes with usage statistics"""
-    promos = await db.promo_codes.find().sort("created_at", -1).to_list(1000)
+    promos = await fetch_page(db.promo_codes, {}, page, response)
+    usage_stats = await promo_usage_stats.get()
     # Convert ObjectId to string for JSON serialization
     clean_promos = []
     for promo in promos:
         promo_clean = clean_object_for_json(promo)
-        clean_promos.append(PromoCode(**promo_clean))
+        clean_promos.append(PromoCodeWithStats(**promo_clean, **usage_stats.get(promo["id"], {})))
     return clean_promos
 
 @api_router.post("/admin/promo-codes", response_model=PromoCode)
@@ -663,6 +1808,7 @@ async def create_promo_code(promo_data: dict, admin_user: User = Depends(get_adm
     promo = PromoCode(**promo_data)
     promo_dict = prepare_for_mongo(promo.dict())
     await db.promo_codes.insert_one(promo_dict)
+    await promo_rules.bump_version()
     return promo
 
 @api_router.put("/admin/promo-codes/{promo_id}", response_model=PromoCode)
@@ -675,6 +1821,8 @@ async def update_promo_code(promo_id: str, promo_data: dict, admin_user: User =
     
     # Update promo code
     promo_data["updated_at"] = datetime.utcnow().isoformat()
+    if existing.get("campaign_id"):
+        promo_data["campaign_override"] = True
     result = await db.promo_codes.update_one(
         {"id": promo_id},
         {"$set": promo_data}
@@ -682,6 +1830,7 @@ async def update_promo_code(promo_id: str, promo_data: dict, admin_user: User =
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Promo code not found")
+    await promo_rules.bump_version()
     
     # Return updated promo
     updated_promo = await db.promo_codes.find_one({"id": promo_id})
@@ -691,84 +1840,924 @@ async def update_promo_code(promo_id: str, promo_data: dict, admin_user: User =
 @api_router.patch("/admin/promo-codes/{promo_id}")
 async def toggle_promo_code_status(promo_id: str, update_data: dict, admin_user: User = Depends(get_admin_user)):
     """Toggle promo code active status"""
-    result = await db.promo_codes.update_one(
+    promo = await db.promo_codes.find_one_and_update(
         {"id": promo_id},
-        {"$set": {**update_data, "updated_at": datetime.utcnow().isoformat()}}
+        {"$set": {**update_data, "updated_at": datetime.utcnow().isoformat()}},
+        projection={"campaign_id": 1}
     )
     
-    if result.matched_count == 0:
-        raise HTTPException(status_code=404, detail="Promo code not found")
+    if promo is None:
+        raise HTTPException(status_code=404, detail="Promo code not found")
+    if promo.get("campaign_id"):
+        await db.promo_codes.update_one({"id": promo_id}, {"$set": {"campaign_override": True}})
+    await promo_rules.bump_version()
+    
+    return {"message": "Promo code updated successfully"}
+
+@api_router.delete("/admin/promo-codes/{promo_id}")
+async def delete_promo_code(promo_id: str, admin_user: User = Depends(get_admin_user)):
+    """Delete a promo code"""
+    promo = await db.promo_codes.find_one_and_delete({"id": promo_id}, projection={"campaign_id": 1})
+    if promo is None:
+        raise HTTPException(status_code=404, detail="Promo code not found")
+    # Drop the campaign's rules once its last code is gone
+    if promo.get("campaign_id") and not await db.promo_codes.find_one({"campaign_id": promo["campaign_id"]}, {"_id": 1}):
+        await db.promo_campaigns.delete_one({"id": promo["campaign_id"]})
+    
+    # Also delete related usage records
+    await db.promo_code_usage.delete_many({"promo_code_id": promo_id})
+    await db.promo_customer_usage.delete_many({"promo_code_id": promo_id})
+    await promo_rules.bump_version()
+    
+    return {"message": "Promo code deleted successfully"}
+
+# Promo campaigns
+PROMO_CAMPAIGN_COLUMNS = [
+    ("code", "code"),
+    ("promo_code_id", "id"),
+    ("campaign_id", "campaign_id")
+]
+
+async def generate_promo_campaign(campaign: PromoCampaignRequest, alphabet: str) -> str:
+    """Insert campaign.count random codes in chunks and return the campaign id.
+
+    The shared rules are stored once in promo_campaigns, which the promo rule
+    cache compiles from. Codes are deduplicated within a chunk; collisions
+    with existing codes are rejected by the unique code index and regenerated
+    in the next round.
+    """
+    campaign_id = str(uuid.uuid4())
+    prefix = campaign.prefix.upper()
+    template = prepare_for_mongo(PromoCode(
+        code=prefix,
+        campaign_id=campaign_id,
+        **campaign.dict(exclude={"count", "prefix", "length", "alphabet"})
+    ).dict())
+    await db.promo_campaigns.insert_one({
+        "id": campaign_id,
+        "count": campaign.count,
+        "rules": template,
+        "created_at": datetime.utcnow().isoformat()
+    })
+    
+    remaining = campaign.count
+    collision_rounds = 0
+    while remaining > 0:
+        codes = set()
+        while len(codes) < min(remaining, PROMO_CAMPAIGN_CHUNK_SIZE):
+            codes.add(prefix + "".join(secrets.choice(alphabet) for _ in range(campaign.length)))
+        docs = [{**template, "id": str(uuid.uuid4()), "code": code} for code in codes]
+        try:
+            await db.promo_codes.insert_many(docs, ordered=False)
+            remaining -= len(docs)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+                raise
+            remaining -= e.details["nInserted"]
+            collision_rounds += 1
+            if collision_rounds > 10:
+                # Don't leave a partial campaign behind that nobody has the CSV for
+                await db.promo_codes.delete_many({"campaign_id": campaign_id})
+                await db.promo_campaigns.delete_one({"id": campaign_id})
+                raise HTTPException(status_code=409, detail="Could not generate enough unique codes; use a longer code length")
+    return campaign_id
+
+@api_router.post("/admin/promo-codes/campaigns")
+async def create_promo_campaign(
+    campaign: PromoCampaignRequest,
+    format: str = Query("csv", pattern="^(csv|gzip)$", description="csv or gzip (gzipped CSV)"),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Generate a batch of unique single-use promo codes and stream them back as CSV"""
+    alphabet = "".join(dict.fromkeys(campaign.alphabet.upper()))
+    if len(alphabet) < 2:
+        raise HTTPException(status_code=400, detail="Alphabet needs at least two distinct characters")
+    # Keep the code space sparse so random draws rarely collide
+    if len(alphabet) ** campaign.length < campaign.count * 1000:
+        raise HTTPException(status_code=400, detail="Code space too small for this many codes; increase length or alphabet")
+    
+    started = perf_counter()
+    campaign_id = await generate_promo_campaign(campaign, alphabet)
+    await promo_rules.bump_version()
+    logger.info(f"Generated {campaign.count} promo codes for campaign {campaign_id} in {(perf_counter() - started) * 1000:.1f}ms")
+    
+    cursor = db.promo_codes.find({"campaign_id": campaign_id}, export_projection(PROMO_CAMPAIGN_COLUMNS))
+    return csv_export_response(cursor, PROMO_CAMPAIGN_COLUMNS, f"promo_campaign_{campaign_id}.csv", format)
+
+# Promo simulator
+class BookingFrameCache:
+    """Columnar (pandas) copies of recent booking windows for repeated what-if runs"""
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    async def load(self, start: str, end: str) -> pd.DataFrame:
+        """Non-cancelled bookings dated start..end, in booking order"""
+        key = (start, end)
+        entry = self.entries.get(key)
+        if entry is not None and monotonic() - entry[0] < self.ttl_seconds:
+            self.entries.move_to_end(key)
+            return entry[1]
+        
+        docs = await db.bookings.find(
+            {"booking_date": {"$gte": start, "$lte": end}, "status": {"$ne": BookingStatus.CANCELLED.value}},
+            {"_id": 0, "customer_id": 1, "booking_date": 1, "created_at": 1, "base_price": 1, "a_la_carte_total": 1},
+            batch_size=10000
+        ).to_list(None)
+        frame = pd.DataFrame.from_records(
+            docs, columns=["customer_id", "booking_date", "created_at", "base_price", "a_la_carte_total"]
+        )
+        frame = frame.sort_values(["booking_date", "created_at"], kind="stable", ignore_index=True)
+        # What the customer would have paid before any discount
+        frame["subtotal"] = (
+            pd.to_numeric(frame["base_price"], errors="coerce").fillna(0.0)
+            + pd.to_numeric(frame["a_la_carte_total"], errors="coerce").fillna(0.0)
+        ).to_numpy(dtype=np.float64)
+        # Integer customer codes make the per-customer grouping cheap on every run
+        frame["customer_code"] = pd.factorize(frame["customer_id"])[0]
+        frame = frame[["customer_id", "customer_code", "booking_date", "subtotal"]]
+        
+        self.entries[key] = (monotonic(), frame)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+        return frame
+
+booking_frames = BookingFrameCache(PROMO_SIMULATION_CACHE_SIZE, PROMO_SIMULATION_CACHE_SECONDS)
+
+def simulate_promo(frame: pd.DataFrame, promo: PromoCode, histogram_bins: int) -> dict:
+    """Apply ``promo`` to every booking in ``frame`` at once, mirroring calculate_discount.
+
+    Bookings qualify in order, so usage_limit and usage_limit_per_customer
+    cap the earliest qualifying bookings the way live redemptions would.
+    """
+    subtotal = frame["subtotal"].to_numpy()
+    eligible = np.ones(len(frame), dtype=bool)
+    if promo.minimum_order_amount:
+        eligible &= subtotal >= promo.minimum_order_amount
+    if promo.applicable_customers:
+        eligible &= frame["customer_id"].isin(promo.applicable_customers).to_numpy()
+    if promo.usage_limit_per_customer:
+        # Running count of earlier qualifying bookings by the same customer
+        prior_uses = eligible.astype(np.int64)
+        prior_uses = pd.Series(prior_uses).groupby(frame["customer_code"].to_numpy()).cumsum().to_numpy() - prior_uses
+        eligible &= prior_uses < promo.usage_limit_per_customer
+    if promo.usage_limit:
+        eligible &= np.cumsum(eligible) <= promo.usage_limit
+    
+    if promo.discount_type == DiscountType.PERCENTAGE:
+        discount = subtotal * promo.discount_value / 100
+    else:
+        discount = np.full(len(frame), promo.discount_value, dtype=np.float64)
+    if promo.maximum_discount_amount:
+        discount = np.minimum(discount, promo.maximum_discount_amount)
+    discount = np.round(np.minimum(discount, subtotal), 2)
+    discount = np.where(eligible, discount, 0.0)
+    
+    applied = discount[eligible]
+    if applied.size:
+        counts, edges = np.histogram(applied, bins=histogram_bins)
+    else:
+        counts, edges = np.zeros(histogram_bins, dtype=np.int64), np.zeros(histogram_bins + 1)
+    total_discount = float(discount.sum())
+    total_subtotal = float(subtotal.sum())
+    return {
+        "bookings_considered": int(len(frame)),
+        "affected_bookings": int(eligible.sum()),
+        "affected_customers": int(np.unique(frame["customer_code"].to_numpy()[eligible]).size),
+        "total_subtotal": round(total_subtotal, 2),
+        "total_discount": round(total_discount, 2),
+        "average_discount": round(float(applied.mean()), 2) if applied.size else 0.0,
+        "discount_share_percent": round(total_discount / total_subtotal * 100, 2) if total_subtotal else 0.0,
+        "histogram": {
+            "bin_edges": [round(float(edge), 2) for edge in edges],
+            "counts": [int(count) for count in counts]
+        }
+    }
+
+@api_router.post("/admin/promo-codes/simulate")
+async def simulate_promo_code(simulation: PromoSimulationRequest, admin_user: User = Depends(get_admin_user)):
+    """Estimate what a proposed promo would have cost on past bookings in a date window"""
+    try:
+        start_date = date.fromisoformat(simulation.start)
+        end_date = date.fromisoformat(simulation.end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    
+    started = perf_counter()
+    frame = await booking_frames.load(start_date.isoformat(), end_date.isoformat())
+    loaded = perf_counter()
+    result = simulate_promo(frame, simulation.promo, simulation.histogram_bins)
+    return {
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        **result,
+        "load_ms": round((loaded - started) * 1000, 1),
+        "simulate_ms": round((perf_counter() - loaded) * 1000, 1)
+    }
+
+# Service catalog cache
+class ServiceCatalog:
+    """Process-wide snapshot of the services collection.
+
+    The catalog version lives in app_metadata and is bumped by every service
+    write. Each process re-checks it at most every ``refresh_seconds`` and
+    reloads only when it changed; writes in this process reload immediately.
+    """
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.version: Optional[int] = None
+        self.services: List[Service] = []
+        self.standard_services: List[Service] = []
+        self.a_la_carte_services: List[Service] = []
+        self.by_id: Dict[str, dict] = {}
+        self.checked_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def load(self, version: int):
+        docs = await db.services.find({}, {"_id": 0}).to_list(None)
+        services = []
+        for doc in docs:
+            # Handle missing category field by providing a default value
+            doc.setdefault("category", "general")
+            services.append(Service(**doc))
+        self.by_id = {doc["id"]: doc for doc in docs}
+        self.services = services
+        self.standard_services = [service for service in services if not service.is_a_la_carte]
+        self.a_la_carte_services = [service for service in services if service.is_a_la_carte]
+        self.version = version
+
+    async def snapshot(self) -> "ServiceCatalog":
+        if self.version is None or monotonic() - self.checked_at >= self.refresh_seconds:
+            async with self.lock:
+                if self.version is None or monotonic() - self.checked_at >= self.refresh_seconds:
+                    meta = await db.app_metadata.find_one({"_id": "service_catalog"})
+                    version = meta.get("version", 0) if meta else 0
+                    if version != self.version:
+                        await self.load(version)
+                    self.checked_at = monotonic()
+        return self
+
+    async def bump_version(self):
+        meta = await db.app_metadata.find_one_and_update(
+            {"_id": "service_catalog"},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        async with self.lock:
+            await self.load(meta["version"])
+            self.checked_at = monotonic()
+
+    def get_service(self, service_id: str) -> Optional[dict]:
+        return self.by_id.get(service_id)
+
+    def etag(self, variant: str) -> str:
+        return f'W/"services-{self.version}-{variant}"'
+
+service_catalog = ServiceCatalog(SERVICE_CATALOG_REFRESH_SECONDS)
+
+def catalog_response(request: Request, response: Response, services: List[Service], variant: str):
+    """Return services with an ETag, or an empty 304 if the client copy is current"""
+    etag = service_catalog.etag(variant)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return services
+
+# Services endpoints
+@api_router.get("/services", response_model=List[Service])
+async def get_services(request: Request, response: Response):
+    catalog = await service_catalog.snapshot()
+    return catalog_response(request, response, catalog.services, "all")
+
+@api_router.get("/services/standard", response_model=List[Service])
+async def get_standard_services(request: Request, response: Response):
+    catalog = await service_catalog.snapshot()
+    return catalog_response(request, response, catalog.standard_services, "standard")
+
+@api_router.get("/services/a-la-carte", response_model=List[Service])
+async def get_a_la_carte_services(request: Request, response: Response):
+    catalog = await service_catalog.snapshot()
+    return catalog_response(request, response, catalog.a_la_carte_services, "a-la-carte")
+
+@api_router.get("/pricing/matrix")
+async def get_pricing_matrix(request: Request, response: Response):
+    """Full pricing grid for client-side caching"""
+    table = pricing.table
+    etag = f'W/"pricing-{table.version}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return table.matrix()
+
+@api_router.get("/admin/pricing")
+async def get_pricing_rules(admin_user: User = Depends(get_admin_user)):
+    """Get the active pricing rules"""
+    return pricing.table.rules
+
+@api_router.put("/admin/pricing")
+async def update_pricing_rules(rules: dict, admin_user: User = Depends(get_admin_user)):
+    """Publish a new pricing table version from a full or partial body merged over the active rules.
+
+    Other workers pick it up within PRICING_REFRESH_SECONDS.
+    """
+    unknown_sizes = set(rules.get("size_prices", {})) | set(rules.get("size_durations", {}))
+    unknown_sizes -= set(HOUSE_SIZE_INDEX)
+    unknown_frequencies = set(rules.get("frequency_multipliers", {})) - set(FREQUENCY_INDEX)
+    if unknown_sizes or unknown_frequencies:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown house sizes {sorted(unknown_sizes)} or frequencies {sorted(unknown_frequencies)}"
+        )
+    
+    try:
+        table = await pricing.publish(rules)
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pricing rules: {str(e)}")
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Pricing rules were changed concurrently; reload and try again")
+    return table.rules
+
+@api_router.get("/pricing/{house_size}/{frequency}")
+async def get_pricing(house_size: HouseSize, frequency: ServiceFrequency):
+    base_price = get_base_price(house_size, frequency)
+    return {"house_size": house_size, "frequency": frequency, "base_price": base_price}
+
+# Slot capacity
+SLOT_COUNTER_PROJECTION = {"_id": 0, "date": 1, "time_slot": 1, "capacity": 1, "reserved": 1, "holds": 1}
+
+async def get_crew_capacity() -> int:
+    """Default jobs per slot: the number of active cleaners (at least one)"""
+    counters = await db.stats_counters.find_one({"_id": DASHBOARD_COUNTERS_ID}, {"total_cleaners": 1})
+    if counters is not None:
+        active_cleaners = counters.get("total_cleaners", 0)
+    else:
+        active_cleaners = await db.cleaners.count_documents({"is_active": True})
+    return max(active_cleaners, 1)
+
+def slot_capacity_expr(crew_capacity: int) -> dict:
+    return {"$ifNull": ["$capacity", crew_capacity]}
+
+def active_holds_expr() -> dict:
+    """Checkout holds on the slot that have not expired yet"""
+    return {"$filter": {
+        "input": {"$ifNull": ["$holds", []]},
+        "as": "hold",
+        "cond": {"$gt": ["$$hold.expires_at", "$$NOW"]}
+    }}
+
+def slot_taken_expr() -> dict:
+    return {"$add": [{"$ifNull": ["$reserved", 0]}, {"$size": active_holds_expr()}]}
+
+def slot_has_room_expr(crew_capacity: int) -> dict:
+    return {"$lt": [slot_taken_expr(), slot_capacity_expr(crew_capacity)]}
+
+# Schedule template
+# Slots are not stored ahead of time: a date's slots come from the weekday
+# template minus holidays, and time_slots only holds reservation counters
+# (and capacity overrides) for slots that have been booked.
+DEFAULT_TIME_SLOTS = ["08:00-10:00", "10:00-12:00", "12:00-14:00", "14:00-16:00", "16:00-18:00"]
+
+DEFAULT_SCHEDULE = {
+    "version": 1,
+    # Keyed by weekday number, Monday = 0
+    "weekday_slots": {str(weekday): DEFAULT_TIME_SLOTS for weekday in range(7)},
+    "holidays": [],
+    "booking_window_days": 90
+}
+
+class ScheduleTemplate:
+    """Weekday working hours plus holiday closures"""
+    def __init__(self, settings: dict):
+        self.settings = {k: v for k, v in settings.items() if k != "_id"}
+        self.version = settings.get("version", 0)
+        weekday_slots = settings.get("weekday_slots", {})
+        self.weekday_slots = [list(weekday_slots.get(str(weekday), [])) for weekday in range(7)]
+        self.holidays = set(settings.get("holidays", []))
+        self.booking_window_days = int(settings.get("booking_window_days", 90))
+
+    def slots_for(self, slot_date: date) -> List[str]:
+        if slot_date.isoformat() in self.holidays:
+            return []
+        return self.weekday_slots[slot_date.weekday()]
+
+    def in_window(self, slot_date: date) -> bool:
+        today = date.today()
+        return today <= slot_date <= today + timedelta(days=self.booking_window_days)
+
+    def offers(self, slot_date: str, time_slot: str) -> bool:
+        """Whether time_slot is bookable on slot_date"""
+        try:
+            parsed = date.fromisoformat(slot_date)
+        except ValueError:
+            return False
+        return self.in_window(parsed) and time_slot in self.slots_for(parsed)
+
+class ScheduleRegistry:
+    """Holds the active schedule template and reloads it when its version changes"""
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.template = ScheduleTemplate(DEFAULT_SCHEDULE)
+
+    async def ensure_loaded(self):
+        await db.app_metadata.update_one(
+            {"_id": "schedule"},
+            {"$setOnInsert": DEFAULT_SCHEDULE},
+            upsert=True
+        )
+        await self.refresh()
+
+    async def refresh(self):
+        settings = await db.app_metadata.find_one({"_id": "schedule"})
+        if settings and settings.get("version") != self.template.version:
+            self.template = ScheduleTemplate(settings)
+            logger.info(f"Loaded schedule template v{self.template.version}")
+
+    async def run_refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Schedule template refresh failed: {e}")
+
+    async def publish(self, settings: dict) -> ScheduleTemplate:
+        template = ScheduleTemplate({**self.template.settings, **settings, "version": self.template.version + 1})
+        await db.app_metadata.replace_one({"_id": "schedule"}, template.settings, upsert=True)
+        self.template = template
+        return template
+
+schedule = ScheduleRegistry(SCHEDULE_REFRESH_SECONDS)
+
+def parse_slot_date(value: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Date must be in YYYY-MM-DD format")
+
+async def get_slot_reservations(start_date: str, end_date: str) -> Dict[tuple, dict]:
+    """Reservation counters for booked slots in a date range, keyed by (date, time_slot)"""
+    docs = await db.time_slots.find(
+        {"date": {"$gte": start_date, "$lte": end_date}},
+        {"_id": 0, "id": 1, "date": 1, "time_slot": 1, "capacity": 1, "reserved": 1, "holds": 1}
+    ).to_list(None)
+    return {(doc["date"], doc["time_slot"]): doc for doc in docs}
+
+def active_holds(reservation: dict) -> List[dict]:
+    now = datetime.utcnow()
+    return [hold for hold in reservation.get("holds") or [] if hold["expires_at"] > now]
+
+def slot_capacity(reservation: Optional[dict], crew_capacity: int) -> int:
+    """Python twin of slot_capacity_expr: an explicit capacity (even 0) wins over crew size"""
+    capacity = (reservation or {}).get("capacity")
+    return crew_capacity if capacity is None else capacity
+
+def slot_remaining(reservation: Optional[dict], crew_capacity: int) -> int:
+    if reservation is None:
+        return crew_capacity
+    return slot_capacity(reservation, crew_capacity) - reservation.get("reserved", 0) - len(active_holds(reservation))
+
+class AvailabilitySummary:
+    """In-memory free-slot count per date for the booking calendar.
+
+    Holds the reservation counters from today onward, updated in place by
+    reserve_time_slot/release_time_slot and resynced from Mongo periodically
+    so reservations taken by other workers show up. Free counts are memoized
+    per date until the schedule template or crew size changes, or until the
+    earliest checkout hold on that date expires.
+    """
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self.reservations: Dict[str, Dict[str, dict]] = {}
+        # date -> (free slot count, time the count goes stale as a hold expires)
+        self.free_by_date: Dict[str, tuple] = {}
+        self.crew_capacity = 1
+        self.schedule_version = None
+        self.loaded = False
+        self.refreshes = 0
+
+    async def refresh(self):
+        crew_capacity = await get_crew_capacity()
+        docs = await db.time_slots.find(
+            {"date": {"$gte": date.today().isoformat()}},
+            SLOT_COUNTER_PROJECTION
+        ).to_list(None)
+        reservations: Dict[str, Dict[str, dict]] = {}
+        for doc in docs:
+            reservations.setdefault(doc["date"], {})[doc["time_slot"]] = doc
+        self.reservations = reservations
+        self.crew_capacity = crew_capacity
+        self.free_by_date = {}
+        self.loaded = True
+        self.refreshes += 1
+
+    async def run_refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.warning(f"Availability summary refresh failed: {e}")
+
+    def record(self, reservation: Optional[dict]):
+        """Apply a reservation counter document returned by a slot write"""
+        if reservation is None:
+            return
+        self.reservations.setdefault(reservation["date"], {})[reservation["time_slot"]] = reservation
+        self.free_by_date.pop(reservation["date"], None)
+
+    def free_slots(self, template: ScheduleTemplate, slot_date: date) -> int:
+        day = slot_date.isoformat()
+        memo = self.free_by_date.get(day)
+        if memo is not None and (memo[1] is None or memo[1] > datetime.utcnow()):
+            return memo[0]
+        day_reservations = self.reservations.get(day, {})
+        time_slots = template.slots_for(slot_date)
+        free = sum(
+            1 for time_slot in time_slots
+            if slot_remaining(day_reservations.get(time_slot), self.crew_capacity) > 0
+        )
+        hold_expiries = [
+            hold["expires_at"]
+            for time_slot in time_slots if time_slot in day_reservations
+            for hold in active_holds(day_reservations[time_slot])
+        ]
+        self.free_by_date[day] = (free, min(hold_expiries, default=None))
+        return free
+
+    async def available_dates(self) -> List[str]:
+        if not self.loaded:
+            await self.refresh()
+        template = schedule.template
+        if template.version != self.schedule_version:
+            self.free_by_date = {}
+            self.schedule_version = template.version
+        today = date.today()
+        return [
+            slot_date.isoformat()
+            for slot_date in (today + timedelta(days=offset) for offset in range(template.booking_window_days + 1))
+            if self.free_slots(template, slot_date) > 0
+        ]
+
+    def get_stats(self) -> dict:
+        return {
+            "dates_with_reservations": len(self.reservations),
+            "memoized_dates": len(self.free_by_date),
+            "crew_capacity": self.crew_capacity,
+            "schedule_version": self.schedule_version,
+            "refreshes": self.refreshes
+        }
+
+availability = AvailabilitySummary(AVAILABILITY_REFRESH_SECONDS)
+
+# Time slots endpoints
+@api_router.get("/time-slots")
+async def get_time_slots(date: str = Query(..., description="Date in YYYY-MM-DD format")):
+    slot_date = parse_slot_date(date)
+    template = schedule.template
+    if not template.in_window(slot_date):
+        return []
+    
+    crew_capacity = await get_crew_capacity()
+    reservations = await get_slot_reservations(date, date)
     
-    return {"message": "Promo code updated successfully"}
+    slots = []
+    for time_slot in template.slots_for(slot_date):
+        reservation = reservations.get((date, time_slot))
+        if slot_remaining(reservation, crew_capacity) <= 0:
+            continue
+        slots.append(TimeSlot(
+            id=reservation["id"] if reservation else f"{date}_{time_slot}",
+            date=date,
+            time_slot=time_slot,
+            capacity=slot_capacity(reservation, crew_capacity),
+            reserved=(reservation or {}).get("reserved", 0)
+        ))
+    return slots
 
-@api_router.delete("/admin/promo-codes/{promo_id}")
-async def delete_promo_code(promo_id: str, admin_user: User = Depends(get_admin_user)):
-    """Delete a promo code"""
-    result = await db.promo_codes.delete_one({"id": promo_id})
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Promo code not found")
+@api_router.get("/time-slots/range")
+async def get_time_slot_range(
+    request: Request,
+    start: str = Query(..., description="First date in YYYY-MM-DD format"),
+    end: str = Query(..., description="Last date in YYYY-MM-DD format, at most 90 days after start")
+):
+    """Free time slots for every date in a range as a compact {date: [time_slot, ...]} map"""
+    start_date = parse_slot_date(start)
+    end_date = parse_slot_date(end)
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    if (end_date - start_date).days >= MAX_SLOT_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {MAX_SLOT_RANGE_DAYS} days")
     
-    # Also delete related usage records
-    await db.promo_code_usage.delete_many({"promo_code_id": promo_id})
+    template = schedule.template
+    crew_capacity = await get_crew_capacity()
+    reservations = await get_slot_reservations(start, end)
     
-    return {"message": "Promo code deleted successfully"}
-
-# Services endpoints
-@api_router.get("/services", response_model=List[Service])
-async def get_services():
-    services = await db.services.find().to_list(1000)
-    # Handle missing category field by providing a default value
-    processed_services = []
-    for service in services:
-        if 'category' not in service:
-            service['category'] = 'general'  # Default category
-        processed_services.append(Service(**service))
-    return processed_services
+    free_slots = {}
+    for offset in range((end_date - start_date).days + 1):
+        slot_date = start_date + timedelta(days=offset)
+        if not template.in_window(slot_date):
+            continue
+        day = slot_date.isoformat()
+        slots = [
+            time_slot for time_slot in template.slots_for(slot_date)
+            if slot_remaining(reservations.get((day, time_slot)), crew_capacity) > 0
+        ]
+        if slots:
+            free_slots[day] = slots
+    
+    body = json.dumps(free_slots, separators=(",", ":"))
+    etag = f'W/"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={SLOT_RANGE_MAX_AGE_SECONDS}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
-@api_router.get("/services/standard", response_model=List[Service])
-async def get_standard_services():
-    services = await db.services.find({"is_a_la_carte": False}).to_list(1000)
-    # Handle missing category field by providing a default value
-    processed_services = []
-    for service in services:
-        if 'category' not in service:
-            service['category'] = 'general'  # Default category
-        processed_services.append(Service(**service))
-    return processed_services
+def slot_hold_owner(current_user: Optional[User], customer_email: Optional[str]) -> str:
+    """Who a hold belongs to: the signed-in user, else the guest's booking identity"""
+    if current_user is not None:
+        return current_user.id
+    if not customer_email:
+        raise HTTPException(status_code=400, detail="customer_email is required to hold a slot as a guest")
+    return f"guest_{customer_email}"
 
-@api_router.get("/services/a-la-carte", response_model=List[Service])
-async def get_a_la_carte_services():
-    services = await db.services.find({"is_a_la_carte": True}).to_list(1000)
-    # Handle missing category field by providing a default value
-    processed_services = []
-    for service in services:
-        if 'category' not in service:
-            service['category'] = 'general'  # Default category
-        processed_services.append(Service(**service))
-    return processed_services
+@api_router.post("/time-slots/holds", response_model=SlotHold, status_code=201)
+async def create_slot_hold(
+    hold_request: SlotHoldRequest,
+    request: Request,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """Hold a slot for the rest of checkout; pass the hold id as hold_id when booking.
 
-@api_router.get("/pricing/{house_size}/{frequency}")
-async def get_pricing(house_size: HouseSize, frequency: ServiceFrequency):
-    base_price = get_base_price(house_size, frequency)
-    return {"house_size": house_size, "frequency": frequency, "base_price": base_price}
+    One live hold per customer: release it before holding another slot.
+    """
+    address = client_address(request)
+    slot_hold_limiter.check(address)
+    owner = slot_hold_owner(current_user, hold_request.customer_email)
+    if not schedule.template.offers(hold_request.date, hold_request.time_slot):
+        raise HTTPException(status_code=409, detail="Selected time slot is not offered on that date")
+    live_holds = await db.slot_holds.count_documents({"client_address": address, "expires_at": {"$gt": datetime.utcnow()}})
+    if live_holds >= MAX_SLOT_HOLDS_PER_CLIENT:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many slots held from this address",
+            headers={"Retry-After": str(SLOT_HOLD_TTL_SECONDS)}
+        )
+    hold = await place_slot_hold(hold_request.date, hold_request.time_slot, owner, address)
+    if hold is None:
+        raise HTTPException(status_code=409, detail="Selected time slot is no longer available")
+    return hold
 
-# Time slots endpoints
-@api_router.get("/time-slots")
-async def get_time_slots(date: str = Query(..., description="Date in YYYY-MM-DD format")):
-    slots = await db.time_slots.find({"date": date, "is_available": True}).to_list(1000)
-    return [TimeSlot(**slot) for slot in slots]
+@api_router.delete("/time-slots/holds/{hold_id}")
+async def delete_slot_hold(
+    hold_id: str,
+    customer_email: Optional[EmailStr] = None,
+    current_user: Optional[User] = Depends(get_optional_user)
+):
+    """Release a checkout hold before it expires"""
+    owner = slot_hold_owner(current_user, customer_email)
+    if not await release_slot_hold(hold_id, owner):
+        raise HTTPException(status_code=404, detail="Hold not found or already expired")
+    return {"message": "Hold released"}
 
 @api_router.get("/available-dates")
 async def get_available_dates():
     """Get all dates that have available time slots"""
-    pipeline = [
-        {"$match": {"is_available": True}},
-        {"$group": {"_id": "$date"}},
-        {"$sort": {"_id": 1}}
-    ]
+    return await availability.available_dates()
+
+@api_router.get("/admin/schedule")
+async def get_schedule_template(admin_user: User = Depends(get_admin_user)):
+    """Get the weekday working-hours template and holiday closures"""
+    return schedule.template.settings
+
+@api_router.put("/admin/schedule")
+async def update_schedule_template(settings: dict, admin_user: User = Depends(get_admin_user)):
+    """Update weekday slots, holidays or the booking window"""
+    allowed_fields = {"weekday_slots", "holidays", "booking_window_days"}
+    update_fields = {k: v for k, v in settings.items() if k in allowed_fields}
+    if not update_fields:
+        raise HTTPException(status_code=400, detail="No updatable fields provided")
+    
+    weekday_slots = update_fields.get("weekday_slots", {})
+    if any(weekday not in {str(day) for day in range(7)} for weekday in weekday_slots):
+        raise HTTPException(status_code=400, detail="weekday_slots keys must be 0 (Monday) through 6 (Sunday)")
+    for holiday in update_fields.get("holidays", []):
+        parse_slot_date(holiday)
+    
+    template = await schedule.publish(update_fields)
+    return template.settings
+
+# Time slot reservation
+async def claim_slot_capacity(slot_date: str, time_slot: str, claim: dict) -> Optional[dict]:
+    """Atomically add a claim (a reservation or a hold) to a slot with room.
+
+    Returns the updated counter document, or None if the slot is full. The
+    counter document is created empty on first use by a plain upsert (an
+    upsert filter cannot carry the $expr capacity check); racing creators
+    collide on the unique (date, time_slot) index and the loser just moves
+    on. Expired holds are pruned on every claim.
+    """
+    crew_capacity = await get_crew_capacity()
+    try:
+        await db.time_slots.update_one(
+            {"date": slot_date, "time_slot": time_slot},
+            {"$setOnInsert": {
+                "id": str(uuid.uuid4()),
+                "created_at": datetime.utcnow().isoformat(),
+                "is_available": True,
+                "reserved": 0,
+                "booking_ids": [],
+                "holds": []
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Another first claim created the counter document
+        pass
+    
+    return await db.time_slots.find_one_and_update(
+        {"date": slot_date, "time_slot": time_slot, "$expr": slot_has_room_expr(crew_capacity)},
+        [
+            {"$set": {
+                "reserved": {"$add": [{"$ifNull": ["$reserved", 0]}, claim.get("reserved", 0)]},
+                "booking_ids": {"$concatArrays": [{"$ifNull": ["$booking_ids", []]}, claim.get("booking_ids", [])]},
+                "holds": {"$concatArrays": [active_holds_expr(), claim.get("holds", [])]}
+            }},
+            {"$set": {"is_available": {"$lt": [slot_taken_expr(), slot_capacity_expr(crew_capacity)]}}}
+        ],
+        projection=SLOT_COUNTER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+
+async def convert_slot_hold(slot_date: str, time_slot: str, hold_id: str, booking_id: str) -> Optional[dict]:
+    """Turn a live hold into a reservation; its capacity unit was already counted"""
+    crew_capacity = await get_crew_capacity()
+    return await db.time_slots.find_one_and_update(
+        {
+            "date": slot_date,
+            "time_slot": time_slot,
+            "holds": {"$elemMatch": {"id": hold_id, "expires_at": {"$gt": datetime.utcnow()}}}
+        },
+        [
+            {"$set": {
+                "reserved": {"$add": [{"$ifNull": ["$reserved", 0]}, 1]},
+                "booking_ids": {"$concatArrays": [{"$ifNull": ["$booking_ids", []]}, [booking_id]]},
+                "holds": {"$filter": {
+                    "input": active_holds_expr(),
+                    "as": "live",
+                    "cond": {"$ne": ["$$live.id", hold_id]}
+                }}
+            }},
+            {"$set": {"is_available": {"$lt": [slot_taken_expr(), slot_capacity_expr(crew_capacity)]}}}
+        ],
+        projection=SLOT_COUNTER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+
+async def reserve_time_slot(slot_date: str, time_slot: str, booking_id: str) -> bool:
+    """Atomically take one unit of a slot's capacity; False if it is full"""
+    slot = await claim_slot_capacity(slot_date, time_slot, {"reserved": 1, "booking_ids": [booking_id]})
+    availability.record(slot)
+    return slot is not None
+
+async def redeem_slot_hold(slot_date: str, time_slot: str, hold_id: str, owner: str, booking_id: str) -> bool:
+    """Convert the owner's live checkout hold on this slot into the booking's reservation.
+
+    False if the hold is unknown, expired, someone else's or for another slot;
+    the caller then has to validate and reserve the slot like any other booking.
+    """
+    if await db.slot_holds.find_one({"_id": owner, "id": hold_id}, {"_id": 1}) is None:
+        return False
+    slot = await convert_slot_hold(slot_date, time_slot, hold_id, booking_id)
+    if slot is None:
+        return False
+    await db.slot_holds.delete_one({"_id": owner, "id": hold_id})
+    availability.record(slot)
+    return True
+
+async def place_slot_hold(slot_date: str, time_slot: str, owner: str, address: str) -> Optional[SlotHold]:
+    """Hold one unit of a slot's capacity for SLOT_HOLD_TTL_SECONDS; None if it is full.
+
+    Hold records are keyed by owner, so taking the record only succeeds once the
+    owner's previous hold has lapsed; a live one is a 409.
+    """
+    now = datetime.utcnow()
+    hold = SlotHold(
+        date=slot_date,
+        time_slot=time_slot,
+        expires_at=now + timedelta(seconds=SLOT_HOLD_TTL_SECONDS),
+        created_at=now
+    )
+    # Native datetime so the TTL index can purge the record once the hold lapses
+    try:
+        await db.slot_holds.find_one_and_update(
+            {"_id": owner, "expires_at": {"$lte": now}},
+            {"$set": {**hold.dict(), "client_address": address}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="You already hold a slot; release it before holding another")
+    slot = await claim_slot_capacity(slot_date, time_slot, {"holds": [{"id": hold.id, "expires_at": hold.expires_at}]})
+    if slot is None:
+        await db.slot_holds.delete_one({"_id": owner, "id": hold.id})
+        return None
+    availability.record(slot)
+    return hold
+
+async def release_slot_hold(hold_id: str, owner: str) -> bool:
+    """Drop the owner's hold early, e.g. when the customer picks another slot"""
+    hold = await db.slot_holds.find_one_and_delete({"_id": owner, "id": hold_id})
+    if hold is None:
+        return False
+    slot = await db.time_slots.find_one_and_update(
+        {"date": hold["date"], "time_slot": hold["time_slot"]},
+        {"$pull": {"holds": {"id": hold_id}}, "$set": {"is_available": True}},
+        projection=SLOT_COUNTER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    availability.record(slot)
+    return True
+
+async def release_time_slot(slot_date: str, time_slot: str, booking_id: str):
+    """Give a unit of capacity back, but only if this booking holds one"""
+    slot = await db.time_slots.find_one_and_update(
+        {"date": slot_date, "time_slot": time_slot, "booking_ids": booking_id},
+        {"$inc": {"reserved": -1}, "$pull": {"booking_ids": booking_id}, "$set": {"is_available": True}},
+        projection=SLOT_COUNTER_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
+    availability.record(slot)
+
+# Quote engine
+async def calculate_quote(quote_request: QuoteRequest, customer_id: Optional[str] = None) -> Quote:
+    """Price a booking in one pass: base price, add-ons, duration and promo discount.
+
+    Side-effect free; add-ons are resolved from the in-memory service catalog.
+    An invalid promo code is reported on the quote rather than raised.
+    """
+    catalog = await service_catalog.snapshot()
+    base_price = get_base_price(quote_request.house_size, quote_request.frequency)
+    
+    a_la_carte_items = []
+    for item in quote_request.a_la_carte_services:
+        service = catalog.get_service(item.service_id)
+        if service:
+            # Use dynamic pricing for Dust Baseboards based on the booking house size
+            unit_price = get_dynamic_a_la_carte_price(service, quote_request.house_size.value)
+            a_la_carte_items.append(QuoteLineItem(
+                service_id=item.service_id,
+                service_name=service["name"],
+                quantity=item.quantity,
+                unit_price=unit_price,
+                total_price=unit_price * item.quantity
+            ))
+    a_la_carte_total = sum(item.total_price for item in a_la_carte_items)
+    subtotal = base_price + a_la_carte_total
+    
+    quote = Quote(
+        house_size=quote_request.house_size,
+        frequency=quote_request.frequency,
+        base_price=base_price,
+        a_la_carte_items=a_la_carte_items,
+        a_la_carte_total=a_la_carte_total,
+        subtotal=subtotal,
+        total_amount=subtotal,
+        estimated_duration_hours=calculate_job_duration(
+            quote_request.house_size,
+            quote_request.services,
+            quote_request.a_la_carte_services
+        )
+    )
+    
+    if quote_request.promo_code:
+        # Priced lines for service-scoped promo rules: the base clean covers the standard services
+        lines = [(tuple(service.service_id for service in quote_request.services), base_price)]
+        lines.extend(((item.service_id,), item.total_price) for item in a_la_carte_items)
+        validation_result = await validate_promo_code(quote_request.promo_code, customer_id, subtotal, lines)
+        quote.promo_code = quote_request.promo_code.upper()
+        quote.promo_valid = validation_result["valid"]
+        quote.promo_message = validation_result.get("message")
+        if validation_result["valid"]:
+            quote.promo_code_id = validation_result["promo"]["id"]
+            quote.discount_amount = validation_result["discount"]
+            quote.total_amount = subtotal - quote.discount_amount
     
-    dates = await db.time_slots.aggregate(pipeline).to_list(1000)
-    return [item["_id"] for item in dates]
+    return quote
+
+@api_router.post("/quote", response_model=Quote)
+async def get_quote(quote_request: QuoteRequest, current_user: Optional[User] = Depends(get_optional_user)):
+    """Price a prospective booking without creating anything.
+
+    Anonymous quotes skip per-customer promo checks so a guest email cannot be
+    probed for its promo history; those checks run when the booking is made.
+    """
+    return await calculate_quote(quote_request, current_user.id if current_user else None)
 
 # Booking endpoints
 @api_router.post("/bookings/guest")
@@ -782,59 +2771,39 @@ async def create_booking(booking_data: dict, current_user: User = Depends(get_cu
     return await create_booking_internal(booking_data, current_user=current_user, is_guest=False)
 
 async def create_booking_internal(booking_data: dict, current_user: User = None, is_guest: bool = False):
-    # Calculate a la carte total
-    a_la_carte_total = 0.0
-    if booking_data.get('a_la_carte_services'):
-        for service_data in booking_data['a_la_carte_services']:
-            service = await db.services.find_one({"id": service_data['service_id']})
-            if service:
-                # Use dynamic pricing for Dust Baseboards based on the booking house size
-                dynamic_price = get_dynamic_a_la_carte_price(service, booking_data['house_size'])
-                a_la_carte_total += dynamic_price * service_data.get('quantity', 1)
-    
-    # Calculate subtotal
-    subtotal = booking_data['base_price'] + a_la_carte_total
-    
-    # Handle promo code if provided
-    discount_amount = 0.0
-    promo_code_id = None
-    if booking_data.get('promo_code'):
-        # For guest users, use a temporary customer ID
-        customer_id = current_user.id if current_user else f"guest_{booking_data['customer']['email']}"
-        
-        # Validate promo code
-        validation_result = await validate_promo_code(
-            booking_data['promo_code'], 
-            customer_id, 
-            subtotal
-        )
-        
-        if validation_result['valid']:
-            discount_amount = validation_result['discount']
-            promo_code_id = validation_result['promo']['id']
-        else:
-            raise HTTPException(status_code=400, detail=validation_result['message'])
-    
-    # Calculate final total
-    final_total = subtotal - discount_amount
-    
-    # Create booking
+    # For guest users, use a temporary customer ID
     user_id = current_user.id if current_user else None
     customer_id = current_user.id if current_user else f"guest_{booking_data['customer']['email']}"
     
+    # Price the booking server-side in one pass (client-supplied prices are ignored)
+    quote_request = QuoteRequest(
+        house_size=booking_data['house_size'],
+        frequency=booking_data['frequency'],
+        services=booking_data['services'],
+        a_la_carte_services=booking_data.get('a_la_carte_services') or [],
+        promo_code=booking_data.get('promo_code')
+    )
+    quote = await calculate_quote(quote_request, customer_id)
+    if quote.promo_valid is False:
+        raise HTTPException(status_code=400, detail=quote.promo_message)
+    
+    discount_amount = quote.discount_amount
+    promo_code_id = quote.promo_code_id
+    
+    # Create booking
     booking = Booking(
         user_id=user_id,
         customer_id=customer_id,
-        house_size=booking_data['house_size'],
-        frequency=booking_data['frequency'],
+        house_size=quote_request.house_size,
+        frequency=quote_request.frequency,
         rooms=booking_data.get('rooms'),
-        services=[BookingService(**service) for service in booking_data['services']],
-        a_la_carte_services=[BookingService(**service) for service in booking_data.get('a_la_carte_services', [])],
+        services=quote_request.services,
+        a_la_carte_services=quote_request.a_la_carte_services,
         booking_date=booking_data['booking_date'],
         time_slot=booking_data['time_slot'],
-        base_price=booking_data['base_price'],
-        a_la_carte_total=a_la_carte_total,
-        total_amount=final_total,
+        base_price=quote.base_price,
+        a_la_carte_total=quote.a_la_carte_total,
+        total_amount=quote.total_amount,
         address=Address(**booking_data['address']) if booking_data.get('address') else Address(
             street=booking_data['customer']['address'],
             city=booking_data['customer']['city'],
@@ -842,11 +2811,7 @@ async def create_booking_internal(booking_data: dict, current_user: User = None,
             zip_code=booking_data['customer']['zip_code']
         ),
         special_instructions=booking_data.get('special_instructions'),
-        estimated_duration_hours=calculate_job_duration(
-            HouseSize(booking_data['house_size']),
-            [BookingService(**service) for service in booking_data['services']],
-            [BookingService(**service) for service in booking_data.get('a_la_carte_services', [])]
-        )
+        estimated_duration_hours=quote.estimated_duration_hours
     )
     
     booking_dict = prepare_for_mongo(booking.dict())
@@ -865,10 +2830,45 @@ async def create_booking_internal(booking_data: dict, current_user: User = None,
             'is_guest': True
         }
     
-    await db.bookings.insert_one(booking_dict)
+    # Redeem the promo against its usage limits first; validation above only saw a snapshot,
+    # and a rejection here must not cost the customer their checkout hold
+    redeem_promo = bool(promo_code_id and discount_amount > 0)
+    if redeem_promo:
+        rejection = await redeem_promo_code(promo_code_id, customer_id, booking.id)
+        if rejection:
+            raise HTTPException(status_code=400, detail=rejection)
+    
+    async def undo_promo():
+        if redeem_promo:
+            await refund_promo_redemption(promo_code_id, customer_id)
+        await release_first_booking(customer_id, booking.id)
+    
+    # Claim the time slot before writing the booking so concurrent guests cannot both get it
+    # A live checkout hold was validated against the schedule when placed; anything else is checked now
+    hold_id = booking_data.get('hold_id')
+    if not (hold_id and await redeem_slot_hold(booking.booking_date, booking.time_slot, hold_id, customer_id, booking.id)):
+        slot_error = None
+        if not schedule.template.offers(booking.booking_date, booking.time_slot):
+            slot_error = "Selected time slot is not offered on that date"
+        elif not await reserve_time_slot(booking.booking_date, booking.time_slot, booking.id):
+            slot_error = "Selected time slot is no longer available"
+        if slot_error:
+            await undo_promo()
+            raise HTTPException(status_code=409, detail=slot_error)
+    
+    # Every booking takes the first-booking marker if it is free, so first-booking-only
+    # codes racing a plain booking cannot both count as the customer's first
+    await mark_first_booking(customer_id, booking.id)
+    try:
+        await db.bookings.insert_one(booking_dict)
+    except Exception:
+        await release_time_slot(booking.booking_date, booking.time_slot, booking.id)
+        await undo_promo()
+        raise
+    await bump_dashboard_counters(total_bookings=1, total_revenue=booking.total_amount)
     
     # Record promo code usage if applicable
-    if promo_code_id and discount_amount > 0:
+    if redeem_promo:
         usage = PromoCodeUsage(
             promo_code_id=promo_code_id,
             customer_id=customer_id,
@@ -877,18 +2877,6 @@ async def create_booking_internal(booking_data: dict, current_user: User = None,
         )
         usage_dict = prepare_for_mongo(usage.dict())
         await db.promo_code_usage.insert_one(usage_dict)
-        
-        # Increment usage count
-        await db.promo_codes.update_one(
-            {"id": promo_code_id},
-            {"$inc": {"usage_count": 1}}
-        )
-    
-    # Mark time slot as unavailable
-    await db.time_slots.update_one(
-        {"date": booking_data['booking_date'], "time_slot": booking_data['time_slot']},
-        {"$set": {"is_available": False}}
-    )
     
     return booking
 
@@ -981,44 +2969,150 @@ async def get_next_appointment(current_user: User = Depends(get_current_user)):
     
     return next_booking
 
-# Admin endpoints
-@api_router.get("/admin/stats")
-async def get_admin_stats(admin_user: User = Depends(get_admin_user)):
-    # Get stats from database
-    total_bookings = await db.bookings.count_documents({})
+# Dashboard counters
+# A single document kept in step with the booking, cleaner and ticket write
+# paths so /admin/stats is one indexed read instead of scans and a $group.
+DASHBOARD_COUNTERS_ID = "dashboard"
+
+async def reconcile_dashboard_counters() -> dict:
+    """Rebuild the dashboard counters document from the source collections"""
     total_revenue = await db.bookings.aggregate([
         {"$group": {"_id": None, "total": {"$sum": "$total_amount"}}}
     ]).to_list(1)
-    total_cleaners = await db.cleaners.count_documents({"is_active": True})
-    open_tickets = await db.tickets.count_documents({"status": {"$ne": "closed"}})
+    counters = {
+        "total_bookings": await db.bookings.count_documents({}),
+        "total_revenue": total_revenue[0]["total"] if total_revenue else 0,
+        "total_cleaners": await db.cleaners.count_documents({"is_active": True}),
+        "open_tickets": await db.tickets.count_documents({"status": {"$ne": "closed"}}),
+        "reconciled_at": datetime.utcnow().isoformat()
+    }
+    await db.stats_counters.replace_one({"_id": DASHBOARD_COUNTERS_ID}, counters, upsert=True)
+    return counters
+
+async def bump_dashboard_counters(**deltas):
+    """Atomically apply counter deltas; a missing document is rebuilt on next read"""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if deltas:
+        await db.stats_counters.update_one({"_id": DASHBOARD_COUNTERS_ID}, {"$inc": deltas})
+
+# Admin endpoints
+@api_router.get("/admin/metrics")
+async def get_admin_metrics(admin_user: User = Depends(get_admin_user)):
+    """Operational metrics for in-process worker pools and caches"""
+    return {
+        "password_pool": password_pool.get_stats(),
+        "user_cache": user_cache.get_stats(),
+        "token_revocations": token_revocations.get_stats(),
+        "service_catalog": {"version": service_catalog.version, "services": len(service_catalog.services)},
+        "promo_rules": {"version": promo_rules.version, "codes": promo_rules.code_count(), "campaigns": len(promo_rules.campaigns)},
+        "availability": availability.get_stats()
+    }
+
+@api_router.patch("/admin/users/{user_id}")
+async def update_user(user_id: str, update_data: dict, admin_user: User = Depends(get_admin_user)):
+    """Update a user's role, active status or profile fields"""
+    allowed_fields = {"role", "is_active", "first_name", "last_name", "phone"}
+    update_fields = {k: v for k, v in update_data.items() if k in allowed_fields}
+    if not update_fields:
+        raise HTTPException(status_code=400, detail="No updatable fields provided")
+    
+    if "role" in update_fields:
+        try:
+            update_fields["role"] = UserRole(update_fields["role"]).value
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid role")
+    
+    # Role and status changes revoke previously issued stateless tokens
+    update_ops = {"$set": {**update_fields, "updated_at": datetime.utcnow().isoformat()}}
+    if "role" in update_fields or "is_active" in update_fields:
+        update_ops["$inc"] = {"token_version": 1}
+    
+    updated_user = await db.users.find_one_and_update(
+        {"id": user_id},
+        update_ops,
+        projection={"_id": 0, "token_version": 1, "is_active": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    
+    if updated_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    invalidate_user_cache(user_id)
+    token_revocations.record_user(user_id, updated_user.get("token_version", 0), updated_user.get("is_active", True))
+    return {"message": "User updated successfully"}
+
+@api_router.get("/admin/stats")
+async def get_admin_stats(admin_user: User = Depends(get_admin_user)):
+    counters = await db.stats_counters.find_one({"_id": DASHBOARD_COUNTERS_ID})
+    if counters is None:
+        counters = await reconcile_dashboard_counters()
     
     return {
-        "total_bookings": total_bookings,
-        "total_revenue": total_revenue[0]["total"] if total_revenue else 0,
-        "total_cleaners": total_cleaners,
-        "open_tickets": open_tickets
+        "total_bookings": counters.get("total_bookings", 0),
+        "total_revenue": round(counters.get("total_revenue", 0), 2),
+        "total_cleaners": counters.get("total_cleaners", 0),
+        "open_tickets": counters.get("open_tickets", 0)
     }
 
+@api_router.post("/admin/stats/reconcile")
+async def reconcile_admin_stats(admin_user: User = Depends(get_admin_user)):
+    """Rebuild the dashboard counters from the underlying collections"""
+    counters = await reconcile_dashboard_counters()
+    counters.pop("_id", None)
+    return counters
+
 @api_router.get("/admin/bookings", response_model=List[Booking])
-async def get_all_bookings(admin_user: User = Depends(get_admin_user)):
-    bookings = await db.bookings.find().sort("created_at", -1).to_list(1000)
+async def get_all_bookings(
+    response: Response,
+    status: Optional[BookingStatus] = None,
+    cleaner_id: Optional[str] = None,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Get all bookings, optionally narrowed to one status and/or cleaner"""
+    query = {}
+    if status:
+        query["status"] = status
+    if cleaner_id:
+        query["cleaner_id"] = cleaner_id
+    bookings = await fetch_page(db.bookings, query, page, response)
     return [Booking(**booking) for booking in bookings]
 
 @api_router.patch("/admin/bookings/{booking_id}")
 async def update_booking(booking_id: str, update_data: dict, admin_user: User = Depends(get_admin_user)):
-    result = await db.bookings.update_one(
+    if "total_amount" in update_data:
+        try:
+            update_data["total_amount"] = float(update_data["total_amount"] or 0)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="total_amount must be a number")
+        if not 0 <= update_data["total_amount"] < float("inf"):
+            raise HTTPException(status_code=400, detail="total_amount must be a non-negative number")
+    
+    previous = await db.bookings.find_one_and_update(
         {"id": booking_id},
-        {"$set": {**update_data, "updated_at": datetime.utcnow().isoformat()}}
+        {"$set": {**update_data, "updated_at": datetime.utcnow().isoformat()}},
+        projection={"_id": 0, "total_amount": 1, "customer_id": 1}
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Booking not found")
+    if update_data.get("status") == BookingStatus.CANCELLED.value:
+        await release_first_booking(previous.get("customer_id"), booking_id)
+    
+    if "total_amount" in update_data:
+        await bump_dashboard_counters(
+            total_revenue=update_data["total_amount"] - previous.get("total_amount", 0)
+        )
     
     return {"message": "Booking updated successfully"}
 
 @api_router.get("/admin/cleaners", response_model=List[Cleaner])
-async def get_cleaners(admin_user: User = Depends(get_admin_user)):
-    cleaners = await db.cleaners.find().to_list(1000)
+async def get_cleaners(
+    response: Response,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(get_admin_user)
+):
+    cleaners = await fetch_page(db.cleaners, {}, page, response, direction=ASCENDING)
     return [Cleaner(**cleaner) for cleaner in cleaners]
 
 @api_router.post("/admin/cleaners", response_model=Cleaner)
@@ -1026,31 +3120,30 @@ async def create_cleaner(cleaner_data: dict, admin_user: User = Depends(get_admi
     cleaner = Cleaner(**cleaner_data)
     cleaner_dict = prepare_for_mongo(cleaner.dict())
     await db.cleaners.insert_one(cleaner_dict)
+    if cleaner.is_active:
+        await bump_dashboard_counters(total_cleaners=1)
     return cleaner
 
 @api_router.delete("/admin/cleaners/{cleaner_id}")
 async def delete_cleaner(cleaner_id: str, admin_user: User = Depends(get_admin_user)):
-    result = await db.cleaners.delete_one({"id": cleaner_id})
-    if result.deleted_count == 0:
+    deleted = await db.cleaners.find_one_and_delete({"id": cleaner_id}, projection={"_id": 0, "is_active": 1})
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Cleaner not found")
+    if deleted.get("is_active", True):
+        await bump_dashboard_counters(total_cleaners=-1)
     return {"message": "Cleaner deleted successfully"}
 
 @api_router.get("/admin/services", response_model=List[Service])
-async def get_admin_services(admin_user: User = Depends(get_admin_user)):
-    services = await db.services.find().to_list(1000)
-    # Handle missing category field by providing a default value
-    processed_services = []
-    for service in services:
-        if 'category' not in service:
-            service['category'] = 'general'  # Default category
-        processed_services.append(Service(**service))
-    return processed_services
+async def get_admin_services(request: Request, response: Response, admin_user: User = Depends(get_admin_user)):
+    catalog = await service_catalog.snapshot()
+    return catalog_response(request, response, catalog.services, "all")
 
 @api_router.post("/admin/services", response_model=Service)
 async def create_service(service_data: dict, admin_user: User = Depends(get_admin_user)):
     service = Service(**service_data)
     service_dict = prepare_for_mongo(service.dict())
     await db.services.insert_one(service_dict)
+    await service_catalog.bump_version()
     return service
 
 @api_router.delete("/admin/services/{service_id}")
@@ -1058,11 +3151,16 @@ async def delete_service(service_id: str, admin_user: User = Depends(get_admin_u
     result = await db.services.delete_one({"id": service_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Service not found")
+    await service_catalog.bump_version()
     return {"message": "Service deleted successfully"}
 
 @api_router.get("/admin/faqs", response_model=List[FAQ])
-async def get_faqs(admin_user: User = Depends(get_admin_user)):
-    faqs = await db.faqs.find().to_list(1000)
+async def get_faqs(
+    response: Response,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(get_admin_user)
+):
+    faqs = await fetch_page(db.faqs, {}, page, response, direction=ASCENDING)
     return [FAQ(**faq) for faq in faqs]
 
 @api_router.post("/admin/faqs", response_model=FAQ)
@@ -1080,43 +3178,52 @@ async def delete_faq(faq_id: str, admin_user: User = Depends(get_admin_user)):
     return {"message": "FAQ deleted successfully"}
 
 @api_router.get("/admin/tickets", response_model=List[Ticket])
-async def get_tickets(admin_user: User = Depends(get_admin_user)):
-    tickets = await db.tickets.find().sort("created_at", -1).to_list(1000)
+async def get_tickets(
+    response: Response,
+    page: PageParams = Depends(),
+    admin_user: User = Depends(get_admin_user)
+):
+    tickets = await fetch_page(db.tickets, {}, page, response)
     return [Ticket(**ticket) for ticket in tickets]
 
 @api_router.patch("/admin/tickets/{ticket_id}")
 async def update_ticket(ticket_id: str, update_data: dict, admin_user: User = Depends(get_admin_user)):
-    result = await db.tickets.update_one(
+    previous = await db.tickets.find_one_and_update(
         {"id": ticket_id},
-        {"$set": {**update_data, "updated_at": datetime.utcnow().isoformat()}}
+        {"$set": {**update_data, "updated_at": datetime.utcnow().isoformat()}},
+        projection={"_id": 0, "status": 1}
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Ticket not found")
     
+    if "status" in update_data:
+        was_open = previous.get("status") != TicketStatus.CLOSED.value
+        is_open = update_data["status"] != TicketStatus.CLOSED.value
+        await bump_dashboard_counters(open_tickets=int(is_open) - int(was_open))
+    
     return {"message": "Ticket updated successfully"}
 
 @api_router.get("/admin/export/bookings")
-async def export_bookings(admin_user: User = Depends(get_admin_user)):
-    bookings = await db.bookings.find().to_list(1000)
+async def export_bookings(
+    format: str = Query("json", pattern="^(json|csv|gzip)$", description="json, csv or gzip (gzipped CSV)"),
+    admin_user: User = Depends(get_admin_user)
+):
+    filename = f"bookings_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    cursor = db.bookings.find({}, export_projection(BOOKING_EXPORT_COLUMNS)).batch_size(1000)
+    
+    if format != "json":
+        return csv_export_response(cursor, BOOKING_EXPORT_COLUMNS, filename, format)
     
     # Convert to CSV-friendly format
     csv_data = []
-    for booking in bookings:
-        csv_data.append({
-            "ID": booking["id"],
-            "Customer ID": booking.get("customer_id", ""),
-            "Date": booking.get("booking_date", ""),
-            "Time": booking.get("time_slot", ""),
-            "House Size": booking.get("house_size", ""),
-            "Frequency": booking.get("frequency", ""),
-            "Amount": booking.get("total_amount", 0),
-            "Status": booking.get("status", ""),
-            "Cleaner": booking.get("cleaner_id", ""),
-            "Created": booking.get("created_at", "")
-        })
+    async for booking in cursor.limit(EXPORT_JSON_ROW_LIMIT + 1):
+        row = {header: booking.get(field, "") for header, field in BOOKING_EXPORT_COLUMNS}
+        row["Amount"] = booking.get("total_amount", 0)
+        csv_data.append(row)
     
-    return {"data": csv_data, "filename": f"bookings_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"}
+    truncated = len(csv_data) > EXPORT_JSON_ROW_LIMIT
+    return {"data": csv_data[:EXPORT_JSON_ROW_LIMIT], "filename": filename, "truncated": truncated}
 
 # Enhanced Google Calendar Integration Endpoints
 @api_router.post("/admin/cleaners/{cleaner_id}/calendar/setup")
@@ -1209,7 +3316,7 @@ async def get_availability_summary(
         # Get all active cleaners
         cleaners = await db.cleaners.find({"is_active": True}).to_list(1000)
         
-        time_slots = ["08:00-10:00", "10:00-12:00", "12:00-14:00", "14:00-16:00", "16:00-18:00"]
+        time_slots = schedule.template.slots_for(parse_slot_date(date))
         
         cleaner_availability = []
         
@@ -1386,7 +3493,9 @@ async def get_unassigned_jobs(admin_user: User = Depends(get_admin_user)):
 # Invoice Management Endpoints
 @api_router.get("/admin/invoices", response_model=List[Invoice])
 async def get_all_invoices(
+    response: Response,
     status: Optional[InvoiceStatus] = None,
+    page: PageParams = Depends(),
     admin_user: User = Depends(get_admin_user)
 ):
     """Get all invoices with optional status filter"""
@@ -1394,7 +3503,7 @@ async def get_all_invoices(
     if status:
         query["status"] = status
     
-    invoices = await db.invoices.find(query).sort("created_at", -1).to_list(1000)
+    invoices = await fetch_page(db.invoices, query, page, response)
     return [Invoice(**invoice) for invoice in invoices]
 
 @api_router.post("/admin/invoices/generate/{booking_id}", response_model=Invoice)
@@ -1420,8 +3529,8 @@ async def generate_invoice_for_booking(
             raise HTTPException(status_code=404, detail="Customer not found")
         
         # Get service details
-        services = await db.services.find().to_list(1000)
-        service_map = {service["id"]: service for service in services}
+        catalog = await service_catalog.snapshot()
+        service_map = catalog.by_id
         
         # Create invoice items
         invoice_items = []
@@ -1841,133 +3950,234 @@ async def delete_invoice(
         raise HTTPException(status_code=500, detail=f"Failed to delete invoice: {str(e)}")
 
 # Initialize database with default data
+# Bump when the default data below changes so existing deployments re-seed once
+SEED_VERSION = 4
+
+DEFAULT_SERVICES = [
+    {"name": "Blinds", "category": "a_la_carte", "description": "Feather dusting only", "a_la_carte_price": 10.00, "is_a_la_carte": True},
+    {"name": "Inside Kitchen/Bathroom Cabinets ( Move Out Only)", "category": "a_la_carte", "description": "Wiping out using micro fiber", "a_la_carte_price": 80.00, "is_a_la_carte": True},
+    {"name": "Oven Cleaning", "category": "a_la_carte", "description": "Cleaning of 1 Oven.  Double oven is double the cost", "a_la_carte_price": 40.00, "is_a_la_carte": True},
+    {"name": "Dust Baseboards", "category": "a_la_carte", "description": "Feather dust under 2500 sf", "a_la_carte_price": 20.00, "is_a_la_carte": True},
+    {"name": "Dust Baseboards", "category": "a_la_carte", "description": "Feather Dust Over 2500 sf", "a_la_carte_price": 30.00, "is_a_la_carte": True},
+    {"name": "Dust Shutters", "category": "a_la_carte", "description": "Feather dust under 2500 sf", "a_la_carte_price": 40.00, "is_a_la_carte": True},
+    {"name": "Dust Shutters", "category": "a_la_carte", "description": "Feather Dust Over 2500 sf", "a_la_carte_price": 60.00, "is_a_la_carte": True},
+    {"name": "Hand Clean Baseboards", "category": "a_la_carte", "description": "Hand wipe under 2500sf", "a_la_carte_price": 60.00, "is_a_la_carte": True},
+    {"name": "Hand Clean Baseboards", "category": "a_la_carte", "description": "Hand wipe over 2500 sf", "a_la_carte_price": 80.00, "is_a_la_carte": True},
+    {"name": "Inside Refrigerator", "category": "a_la_carte", "description": "Clean inside of Fridge ( not Freezer)", "a_la_carte_price": 45.00, "is_a_la_carte": True},
+    {"name": "Vacuum Couch", "category": "a_la_carte", "description": "Top and Underneath (Includes 1 couch and 1 love seat combo or 1 sectional)", "a_la_carte_price": 15.00, "is_a_la_carte": True},
+    {"name": "Clean Exterior Kitchen/Bathrooms cabinets", "category": "a_la_carte", "description": "Hand wipe all exterior upper and lowers cabinets", "a_la_carte_price": 40.00, "is_a_la_carte": True},
+    {"name": "Dusting High Ceiling Fan", "category": "a_la_carte", "description": "Dusting ceiling fans over 10ft", "a_la_carte_price": 10.00, "is_a_la_carte": True},
+    {"name": "Cleaning of Interior doors/frames", "category": "a_la_carte", "description": "Hand wipe interior door/frames/molding", "a_la_carte_price": 75.00, "is_a_la_carte": True}
+]
+
 async def initialize_database():
-    """Initialize database with default services and time slots"""
-    
-    # Create admin user if it doesn't exist
-    admin_user = await db.users.find_one({"email": "admin@maids.com"})
-    if not admin_user:
-        admin = User(
-            email="admin@maids.com",
-            first_name="Admin",
-            last_name="User",
-            password_hash=hash_password("admin123"),
-            role=UserRole.ADMIN
-        )
-        await db.users.insert_one(prepare_for_mongo(admin.dict()))
-        print("Created admin user: admin@maids.com / admin123")
-    
-    # Create demo customer if it doesn't exist
-    demo_customer = await db.users.find_one({"email": "test@maids.com"})
-    if not demo_customer:
-        customer = User(
-            email="test@maids.com",
-            first_name="Test",
-            last_name="Customer",
-            phone="(555) 123-4567",
-            password_hash=hash_password("test@maids@1234"),
-            role=UserRole.CUSTOMER
-        )
-        await db.users.insert_one(prepare_for_mongo(customer.dict()))
-        print("Created demo customer: test@maids.com / test@maids@1234")
-    
-    # Create demo cleaner if it doesn't exist
-    demo_cleaner_user = await db.users.find_one({"email": "cleaner@maids.com"})
-    if not demo_cleaner_user:
-        cleaner_user = User(
-            email="cleaner@maids.com",
-            first_name="Demo",
-            last_name="Cleaner",
-            phone="(555) 987-6543",
-            password_hash=hash_password("cleaner123"),
-            role=UserRole.CLEANER
-        )
-        await db.users.insert_one(prepare_for_mongo(cleaner_user.dict()))
-        print("Created demo cleaner user: cleaner@maids.com / cleaner123")
-    
-    # Create demo cleaner profile if it doesn't exist
-    demo_cleaner = await db.cleaners.find_one({"email": "cleaner@maids.com"})
-    if not demo_cleaner:
-        cleaner = Cleaner(
-            email="cleaner@maids.com",
-            first_name="Demo",
-            last_name="Cleaner",
-            phone="(555) 987-6543",
-            rating=4.8,
-            total_jobs=45
-        )
-        await db.cleaners.insert_one(prepare_for_mongo(cleaner.dict()))
-        print("Created demo cleaner profile")
-    
-    # Create default services if they don't exist
-    services_count = await db.services.count_documents({})
-    if services_count == 0:
-        default_services = [
-            {"name": "Blinds", "category": "a_la_carte", "description": "Feather dusting only", "a_la_carte_price": 10.00, "is_a_la_carte": True},
-            {"name": "Inside Kitchen/Bathroom Cabinets ( Move Out Only)", "category": "a_la_carte", "description": "Wiping out using micro fiber", "a_la_carte_price": 80.00, "is_a_la_carte": True},
-            {"name": "Oven Cleaning", "category": "a_la_carte", "description": "Cleaning of 1 Oven.  Double oven is double the cost", "a_la_carte_price": 40.00, "is_a_la_carte": True},
-            {"name": "Dust Baseboards", "category": "a_la_carte", "description": "Feather dust under 2500 sf", "a_la_carte_price": 20.00, "is_a_la_carte": True},
-            {"name": "Dust Baseboards", "category": "a_la_carte", "description": "Feather Dust Over 2500 sf", "a_la_carte_price": 30.00, "is_a_la_carte": True},
-            {"name": "Dust Shutters", "category": "a_la_carte", "description": "Feather dust under 2500 sf", "a_la_carte_price": 40.00, "is_a_la_carte": True},
-            {"name": "Dust Shutters", "category": "a_la_carte", "description": "Feather Dust Over 2500 sf", "a_la_carte_price": 60.00, "is_a_la_carte": True},
-            {"name": "Hand Clean Baseboards", "category": "a_la_carte", "description": "Hand wipe under 2500sf", "a_la_carte_price": 60.00, "is_a_la_carte": True},
-            {"name": "Hand Clean Baseboards", "category": "a_la_carte", "description": "Hand wipe over 2500 sf", "a_la_carte_price": 80.00, "is_a_la_carte": True},
-            {"name": "Inside Refrigerator", "category": "a_la_carte", "description": "Clean inside of Fridge ( not Freezer)", "a_la_carte_price": 45.00, "is_a_la_carte": True},
-            {"name": "Vacuum Couch", "category": "a_la_carte", "description": "Top and Underneath (Includes 1 couch and 1 love seat combo or 1 sectional)", "a_la_carte_price": 15.00, "is_a_la_carte": True},
-            {"name": "Clean Exterior Kitchen/Bathrooms cabinets", "category": "a_la_carte", "description": "Hand wipe all exterior upper and lowers cabinets", "a_la_carte_price": 40.00, "is_a_la_carte": True},
-            {"name": "Dusting High Ceiling Fan", "category": "a_la_carte", "description": "Dusting ceiling fans over 10ft", "a_la_carte_price": 10.00, "is_a_la_carte": True},
-            {"name": "Cleaning of Interior doors/frames", "category": "a_la_carte", "description": "Hand wipe interior door/frames/molding", "a_la_carte_price": 75.00, "is_a_la_carte": True}
-        ]
-        
-        for service_data in default_services:
-            service = Service(**service_data)
-            await db.services.insert_one(prepare_for_mongo(service.dict()))
-        
-        print("Created default services")
+    """Initialize database with default users, services and time slots.
+
+    Seeding uses idempotent bulk upserts keyed on natural unique keys and records
+    a seed-version marker, so warm starts skip it after a single read.
+    """
+    started = perf_counter()
     
-    # Create time slots for next 30 days if they don't exist
-    slots_count = await db.time_slots.count_documents({})
-    if slots_count == 0:
-        time_slots = ["08:00-10:00", "10:00-12:00", "12:00-14:00", "14:00-16:00", "16:00-18:00"]
-        
-        for i in range(30):  # Next 30 days
-            slot_date = (datetime.now() + timedelta(days=i)).strftime("%Y-%m-%d")
-            
-            for time_slot in time_slots:
-                slot = TimeSlot(date=slot_date, time_slot=time_slot)
-                await db.time_slots.insert_one(prepare_for_mongo(slot.dict()))
-        
-        print("Created time slots for next 30 days")
+    seed_marker = await db.app_metadata.find_one({"_id": "seed"})
+    if seed_marker and seed_marker.get("version", 0) >= SEED_VERSION:
+        logger.info(f"Database seed v{SEED_VERSION} already applied, skipped in {(perf_counter() - started) * 1000:.1f}ms")
+        return
+    
+    # Default users (hashed concurrently on the password pool)
+    default_users = [
+        {"email": "admin@maids.com", "first_name": "Admin", "last_name": "User", "password": "admin123", "role": UserRole.ADMIN},
+        {"email": "test@maids.com", "first_name": "Test", "last_name": "Customer", "phone": "(555) 123-4567", "password": "test@maids@1234", "role": UserRole.CUSTOMER},
+        {"email": "cleaner@maids.com", "first_name": "Demo", "last_name": "Cleaner", "phone": "(555) 987-6543", "password": "cleaner123", "role": UserRole.CLEANER}
+    ]
+    password_hashes = await asyncio.gather(*[hash_password_async(user_data["password"]) for user_data in default_users])
+    user_ops = []
+    for user_data, password_hash in zip(default_users, password_hashes):
+        fields = {k: v for k, v in user_data.items() if k != "password"}
+        user = User(**fields, password_hash=password_hash)
+        user_ops.append(UpdateOne({"email": user.email}, {"$setOnInsert": prepare_for_mongo(user.dict())}, upsert=True))
+    result = await db.users.bulk_write(user_ops, ordered=False)
+    logger.info(f"Seeded users: {result.upserted_count} created")
+    
+    # Demo cleaner profile
+    cleaner = Cleaner(
+        email="cleaner@maids.com",
+        first_name="Demo",
+        last_name="Cleaner",
+        phone="(555) 987-6543",
+        rating=4.8,
+        total_jobs=45
+    )
+    await db.cleaners.update_one(
+        {"email": cleaner.email},
+        {"$setOnInsert": prepare_for_mongo(cleaner.dict())},
+        upsert=True
+    )
+    
+    # Default services, keyed on name + description (some names repeat per size band)
+    service_ops = []
+    for service_data in DEFAULT_SERVICES:
+        service = Service(**service_data)
+        service_ops.append(UpdateOne(
+            {"name": service.name, "description": service.description},
+            {"$setOnInsert": prepare_for_mongo(service.dict())},
+            upsert=True
+        ))
+    result = await db.services.bulk_write(service_ops, ordered=False)
+    logger.info(f"Seeded services: {result.upserted_count} created")
+    if result.upserted_count:
+        await service_catalog.bump_version()
+    
+    # v2: slots track a reserved counter; slots booked before that count as one reservation
+    result = await db.time_slots.update_many(
+        {"reserved": {"$exists": False}},
+        [{"$set": {"reserved": {"$cond": [{"$eq": ["$is_available", False]}, 1, 0]}}}]
+    )
+    if result.modified_count:
+        logger.info(f"Migrated {result.modified_count} time slots to reservation counters")
+    
+    # v3: slots come from the schedule template, so unreserved materialized slots are redundant
+    result = await db.time_slots.delete_many({"reserved": {"$lte": 0}, "capacity": None})
+    if result.deleted_count:
+        logger.info(f"Removed {result.deleted_count} unreserved materialized time slots")
+    
+    # v4: per-customer promo usage is read from counters keyed on promo id + customer id
+    await db.promo_code_usage.aggregate([
+        {"$group": {
+            "_id": {"$concat": ["$promo_code_id", ":", "$customer_id"]},
+            "promo_code_id": {"$first": "$promo_code_id"},
+            "customer_id": {"$first": "$customer_id"},
+            "count": {"$sum": 1}
+        }},
+        {"$merge": {"into": "promo_customer_usage", "whenMatched": "replace"}}
+    ]).to_list(None)
+    
+    await db.app_metadata.update_one(
+        {"_id": "seed"},
+        {"$set": {"version": SEED_VERSION, "seeded_at": datetime.utcnow().isoformat()}},
+        upsert=True
+    )
+    logger.info(f"Database seed v{SEED_VERSION} applied in {(perf_counter() - started) * 1000:.1f}ms")
+
+# Index management
+# Every index the application relies on, applied idempotently at startup
+INDEX_SPECS = [
+    {"collection": "users", "keys": [("email", ASCENDING)], "unique": True},
+    {"collection": "users", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "bookings", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "bookings", "keys": [("customer_id", ASCENDING), ("created_at", DESCENDING)]},
+    {"collection": "bookings", "keys": [("user_id", ASCENDING)]},
+    {"collection": "bookings", "keys": [("booking_date", ASCENDING), ("status", ASCENDING)]},
+    {"collection": "bookings", "keys": [("status", ASCENDING), ("updated_at", DESCENDING)]},
+    {"collection": "bookings", "keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "bookings", "keys": [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "bookings", "keys": [("cleaner_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "time_slots", "keys": [("date", ASCENDING), ("time_slot", ASCENDING)], "unique": True},
+    {"collection": "time_slots", "keys": [("is_available", ASCENDING), ("date", ASCENDING)]},
+    {"collection": "services", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "services", "keys": [("name", ASCENDING), ("description", ASCENDING)]},
+    {"collection": "cleaners", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "cleaners", "keys": [("created_at", ASCENDING), ("id", ASCENDING)]},
+    {"collection": "faqs", "keys": [("created_at", ASCENDING), ("id", ASCENDING)]},
+    {"collection": "tickets", "keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "promo_codes", "keys": [("code", ASCENDING)], "unique": True},
+    {"collection": "promo_codes", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "promo_codes", "keys": [("campaign_id", ASCENDING)]},
+    {"collection": "promo_campaigns", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "promo_codes", "keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "promo_code_usage", "keys": [("customer_id", ASCENDING), ("promo_code_id", ASCENDING)]},
+    {"collection": "promo_code_usage", "keys": [("promo_code_id", ASCENDING)]},
+    {"collection": "promo_customer_usage", "keys": [("promo_code_id", ASCENDING)]},
+    {"collection": "invoices", "keys": [("booking_id", ASCENDING)]},
+    {"collection": "invoices", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "invoices", "keys": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "invoices", "keys": [("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "refresh_tokens", "keys": [("token_hash", ASCENDING)], "unique": True},
+    {"collection": "refresh_tokens", "keys": [("family_id", ASCENDING)]},
+    {"collection": "refresh_tokens", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    {"collection": "slot_holds", "keys": [("id", ASCENDING)], "unique": True},
+    {"collection": "slot_holds", "keys": [("expires_at", ASCENDING)], "expireAfterSeconds": 0},
+    {"collection": "slot_holds", "keys": [("client_address", ASCENDING), ("expires_at", ASCENDING)]},
+    {"collection": "users", "keys": [("token_version", ASCENDING)], "sparse": True},
+    {"collection": "users", "keys": [("is_active", ASCENDING)], "partialFilterExpression": {"is_active": False}},
+    {"collection": "pricing_tables", "keys": [("version", DESCENDING)], "unique": True}
+]
+
+# Hot queries that must be served by an index (checked by check_indexes.py)
+HOT_QUERIES = [
+    {"collection": "users", "filter": {"email": "admin@maids.com"}},
+    {"collection": "users", "filter": {"id": "x"}},
+    {"collection": "users", "filter": {"$or": [{"token_version": {"$gt": 0}}, {"is_active": False}]}},
+    {"collection": "bookings", "filter": {"id": "x"}},
+    {"collection": "bookings", "filter": {"customer_id": "x"}, "sort": [("created_at", DESCENDING)]},
+    {"collection": "bookings", "filter": {"user_id": "x"}},
+    {"collection": "bookings", "filter": {"booking_date": {"$gte": "2025-01-01", "$lte": "2025-01-31"}}},
+    {"collection": "bookings", "filter": {"booking_date": "2025-01-01", "status": "pending"}},
+    {"collection": "bookings", "filter": {}, "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "bookings", "filter": {"status": "completed"}, "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "bookings", "filter": {"cleaner_id": "x"}, "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "invoices", "filter": {"status": "draft"}, "sort": [("created_at", DESCENDING), ("id", DESCENDING)]},
+    {"collection": "time_slots", "filter": {"date": "2025-01-01", "is_available": True}},
+    {"collection": "time_slots", "filter": {"date": "2025-01-01", "time_slot": "08:00-10:00"}},
+    {"collection": "services", "filter": {"id": "x"}},
+    {"collection": "promo_codes", "filter": {"code": "SAVE10"}},
+    {"collection": "promo_code_usage", "filter": {"customer_id": "x", "promo_code_id": "x"}},
+    {"collection": "invoices", "filter": {"booking_id": "x"}},
+    {"collection": "refresh_tokens", "filter": {"token_hash": "x"}}
+]
+
+async def ensure_indexes():
+    """Create every index in INDEX_SPECS; existing identical indexes are a no-op"""
+    started = perf_counter()
+    for spec in INDEX_SPECS:
+        options = {k: v for k, v in spec.items() if k not in ("collection", "keys")}
+        try:
+            await db[spec["collection"]].create_index(spec["keys"], **options)
+        except OperationFailure as e:
+            # Usually duplicate data blocking a unique index, or a conflicting existing index
+            logger.error(f"Failed to create index {spec['collection']}{spec['keys']}: {e}")
+    logger.info(f"Ensured {len(INDEX_SPECS)} indexes in {(perf_counter() - started) * 1000:.1f}ms")
 
 @app.on_event("startup")
 async def startup_event():
+    await ensure_indexes()
     await initialize_database()
+    await pricing.ensure_loaded()
+    app.state.pricing_refresh_task = asyncio.create_task(pricing.run_refresh_loop())
+    await schedule.ensure_loaded()
+    app.state.schedule_refresh_task = asyncio.create_task(schedule.run_refresh_loop())
+    await availability.refresh()
+    app.state.availability_refresh_task = asyncio.create_task(availability.run_refresh_loop())
+    if STATELESS_TOKENS_ENABLED:
+        app.state.token_revocation_task = asyncio.create_task(token_revocations.run_refresh_loop())
 
 # Reports endpoints
-@api_router.get("/admin/reports/weekly")
-async def get_weekly_report(admin_user: User = Depends(get_admin_user)):
-    """Get weekly report data"""
-    from datetime import datetime, timedelta
-    
-    # Get current week start and end
+REPORT_GRANULARITIES = {
+    "day": "$booking_date",
+    "week": {"$dateToString": {"format": "%G-W%V", "date": {"$dateFromString": {"dateString": "$booking_date"}}}},
+    "month": {"$substrBytes": ["$booking_date", 0, 7]}
+}
+
+def report_window(report_type: str) -> tuple:
+    """Return (start, end) YYYY-MM-DD strings for the current week or month"""
     today = datetime.now()
-    week_start = today - timedelta(days=today.weekday())
-    week_end = week_start + timedelta(days=6)
-    
-    # Get bookings for this week
-    bookings = await db.bookings.find({
-        "booking_date": {
-            "$gte": week_start.strftime("%Y-%m-%d"),
-            "$lte": week_end.strftime("%Y-%m-%d")
-        }
-    }).to_list(1000)
-    
-    # Calculate stats
-    total_bookings = len(bookings)
-    revenue = sum(booking.get("total_amount", 0) for booking in bookings)
-    cancellations = len([b for b in bookings if b.get("status") == "cancelled"])
-    reschedules = len([b for b in bookings if b.get("status") == "rescheduled"])
-    completed = len([b for b in bookings if b.get("status") == "completed"])
+    if report_type == "weekly":
+        start = today - timedelta(days=today.weekday())
+        end = start + timedelta(days=6)
+    else:  # monthly
+        start = today.replace(day=1)
+        if today.month == 12:
+            end = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
+        else:
+            end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+def status_count(status_value: str) -> dict:
+    return {"$sum": {"$cond": [{"$eq": ["$status", status_value]}, 1, 0]}}
+
+def format_report_stats(stats: dict) -> dict:
+    total_bookings = stats.get("totalBookings", 0)
+    revenue = stats.get("revenue", 0) or 0
+    completed = stats.get("completed", 0)
     
     completion_rate = (completed / total_bookings * 100) if total_bookings > 0 else 0
     avg_booking_value = (revenue / total_bookings) if total_bookings > 0 else 0
@@ -1975,102 +4185,108 @@ async def get_weekly_report(admin_user: User = Depends(get_admin_user)):
     return {
         "totalBookings": total_bookings,
         "revenue": round(revenue, 2),
-        "cancellations": cancellations,
-        "reschedules": reschedules,
+        "cancellations": stats.get("cancellations", 0),
+        "reschedules": stats.get("reschedules", 0),
         "completionRate": round(completion_rate, 1),
         "customerSatisfaction": 95.0,  # Placeholder - would come from feedback system
         "avgBookingValue": round(avg_booking_value, 2)
     }
 
+async def build_booking_report(start_date: str, end_date: str, granularity: Optional[str] = None) -> dict:
+    """Compute report stats for bookings dated start_date..end_date (inclusive) in Mongo.
+
+    Returns the summary fields used by the dashboard and, when a granularity is
+    given, a ``series`` of the same stats per day, ISO week or month.
+    """
+    group_stats = {
+        "totalBookings": {"$sum": 1},
+        "revenue": {"$sum": "$total_amount"},
+        "cancellations": status_count("cancelled"),
+        "reschedules": status_count("rescheduled"),
+        "completed": status_count("completed")
+    }
+    facets = {"summary": [{"$group": {"_id": None, **group_stats}}]}
+    if granularity:
+        facets["series"] = [
+            {"$group": {"_id": REPORT_GRANULARITIES[granularity], **group_stats}},
+            {"$sort": {"_id": 1}}
+        ]
+    
+    pipeline = [
+        {"$match": {"booking_date": {"$gte": start_date, "$lte": end_date}}},
+        {"$project": {"booking_date": 1, "status": 1, "total_amount": 1}},
+        {"$facet": facets}
+    ]
+    result = (await db.bookings.aggregate(pipeline).to_list(1))[0]
+    
+    report = format_report_stats(result["summary"][0] if result["summary"] else {})
+    if granularity:
+        report["series"] = [
+            {"period": bucket["_id"], **format_report_stats(bucket)}
+            for bucket in result["series"]
+        ]
+    return report
+
+@api_router.get("/admin/reports/weekly")
+async def get_weekly_report(admin_user: User = Depends(get_admin_user)):
+    """Get weekly report data"""
+    start_date, end_date = report_window("weekly")
+    return await build_booking_report(start_date, end_date)
+
 @api_router.get("/admin/reports/monthly")
 async def get_monthly_report(admin_user: User = Depends(get_admin_user)):
     """Get monthly report data"""
-    from datetime import datetime, timedelta
-    
-    # Get current month start and end
-    today = datetime.now()
-    month_start = today.replace(day=1)
-    if today.month == 12:
-        month_end = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-    else:
-        month_end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-    
-    # Get bookings for this month
-    bookings = await db.bookings.find({
-        "booking_date": {
-            "$gte": month_start.strftime("%Y-%m-%d"),
-            "$lte": month_end.strftime("%Y-%m-%d")
-        }
-    }).to_list(1000)
-    
-    # Calculate stats
-    total_bookings = len(bookings)
-    revenue = sum(booking.get("total_amount", 0) for booking in bookings)
-    cancellations = len([b for b in bookings if b.get("status") == "cancelled"])
-    reschedules = len([b for b in bookings if b.get("status") == "rescheduled"])
-    completed = len([b for b in bookings if b.get("status") == "completed"])
-    
-    completion_rate = (completed / total_bookings * 100) if total_bookings > 0 else 0
-    avg_booking_value = (revenue / total_bookings) if total_bookings > 0 else 0
+    start_date, end_date = report_window("monthly")
+    return await build_booking_report(start_date, end_date)
+
+@api_router.get("/admin/reports/range")
+async def get_range_report(
+    start: str = Query(..., description="Start date in YYYY-MM-DD format"),
+    end: str = Query(..., description="End date in YYYY-MM-DD format (inclusive)"),
+    granularity: Optional[str] = Query(None, pattern="^(day|week|month)$"),
+    admin_user: User = Depends(get_admin_user)
+):
+    """Get report data for an arbitrary date range, optionally broken down by period"""
+    try:
+        start_date = date.fromisoformat(start)
+        end_date = date.fromisoformat(end)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be in YYYY-MM-DD format")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="End date must not be before start date")
     
-    return {
-        "totalBookings": total_bookings,
-        "revenue": round(revenue, 2),
-        "cancellations": cancellations,
-        "reschedules": reschedules,
-        "completionRate": round(completion_rate, 1),
-        "customerSatisfaction": 95.0,  # Placeholder - would come from feedback system
-        "avgBookingValue": round(avg_booking_value, 2)
-    }
+    report = await build_booking_report(start_date.isoformat(), end_date.isoformat(), granularity)
+    return {"start": start_date.isoformat(), "end": end_date.isoformat(), "granularity": granularity, **report}
 
 @api_router.get("/admin/reports/{report_type}/export")
-async def export_report(report_type: str, admin_user: User = Depends(get_admin_user)):
+async def export_report(
+    report_type: str,
+    format: str = Query("json", pattern="^(json|csv|gzip)$", description="json, csv or gzip (gzipped CSV)"),
+    admin_user: User = Depends(get_admin_user)
+):
     """Export report data as CSV"""
-    from datetime import datetime, timedelta
+    start_date, end_date = report_window(report_type)
     
-    if report_type == "weekly":
-        today = datetime.now()
-        week_start = today - timedelta(days=today.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        bookings = await db.bookings.find({
-            "booking_date": {
-                "$gte": week_start.strftime("%Y-%m-%d"),
-                "$lte": week_end.strftime("%Y-%m-%d")
-            }
-        }).to_list(1000)
-    else:  # monthly
-        today = datetime.now()
-        month_start = today.replace(day=1)
-        if today.month == 12:
-            month_end = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            month_end = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-        
-        bookings = await db.bookings.find({
-            "booking_date": {
-                "$gte": month_start.strftime("%Y-%m-%d"),
-                "$lte": month_end.strftime("%Y-%m-%d")
-            }
-        }).to_list(1000)
+    cursor = db.bookings.find({
+        "booking_date": {
+            "$gte": start_date,
+            "$lte": end_date
+        }
+    }, export_projection(REPORT_EXPORT_COLUMNS)).batch_size(1000)
+    
+    if format != "json":
+        filename = f"{report_type}_report_{datetime.now().strftime('%Y-%m-%d')}.csv"
+        return csv_export_response(cursor, REPORT_EXPORT_COLUMNS, filename, format)
     
     # Format data for CSV export
     export_data = []
-    for booking in bookings:
-        export_data.append({
-            "booking_id": booking.get("id", ""),
-            "customer_id": booking.get("customer_id", ""),
-            "booking_date": booking.get("booking_date", ""),
-            "time_slot": booking.get("time_slot", ""),
-            "house_size": booking.get("house_size", ""),
-            "frequency": booking.get("frequency", ""),
-            "total_amount": booking.get("total_amount", 0),
-            "status": booking.get("status", ""),
-            "cleaner_id": booking.get("cleaner_id", ""),
-            "created_at": booking.get("created_at", "")
-        })
+    async for booking in cursor.limit(EXPORT_JSON_ROW_LIMIT + 1):
+        row = {header: booking.get(field, "") for header, field in REPORT_EXPORT_COLUMNS}
+        row["total_amount"] = booking.get("total_amount", 0)
+        export_data.append(row)
     
-    return {"data": export_data}
+    truncated = len(export_data) > EXPORT_JSON_ROW_LIMIT
+    return {"data": export_data[:EXPORT_JSON_ROW_LIMIT], "truncated": truncated}
 
 # Order Management endpoints
 @api_router.get("/admin/orders/pending")
@@ -2129,14 +4345,19 @@ async def get_order_history(admin_user: User = Depends(get_admin_user)):
 @api_router.post("/admin/orders/{order_id}/approve_cancellation")
 async def approve_cancellation(order_id: str, admin_user: User = Depends(get_admin_user)):
     """Approve a cancellation request"""
-    result = await db.bookings.update_one(
+    booking = await db.bookings.find_one_and_update(
         {"id": order_id, "status": "pending_cancellation"},
-        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow().isoformat()}}
+        {"$set": {"status": "cancelled", "updated_at": datetime.utcnow().isoformat()}},
+        projection={"_id": 0, "booking_date": 1, "time_slot": 1, "customer_id": 1}
     )
     
-    if result.modified_count == 0:
+    if booking is None:
         raise HTTPException(status_code=404, detail="Pending cancellation not found")
     
+    # Free the crew capacity the booking was holding, and its claim to be the customer's first
+    await release_time_slot(booking["booking_date"], booking["time_slot"], order_id)
+    await release_first_booking(booking.get("customer_id"), order_id)
+    
     return {"message": "Cancellation approved"}
 
 @api_router.post("/admin/orders/{order_id}/deny_cancellation")
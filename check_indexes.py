@@ -0,0 +1,44 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from server import db, ensure_indexes, HOT_QUERIES
+
+
+def find_collection_scans(plan):
+    """Return the names of any COLLSCAN stages in an explain() plan tree"""
+    scans = []
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            scans.append(plan["stage"])
+        for key in ("inputStage", "queryPlan", "winningPlan"):
+            scans.extend(find_collection_scans(plan.get(key)))
+        for child in plan.get("inputStages", []):
+            scans.extend(find_collection_scans(child))
+    return scans
+
+async def check_indexes():
+    await ensure_indexes()
+    
+    failures = 0
+    for query in HOT_QUERIES:
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        
+        label = f"{query['collection']} {query['filter']} sort={query.get('sort')}"
+        if find_collection_scans(winning_plan):
+            failures += 1
+            print(f"❌ COLLSCAN: {label}")
+        else:
+            print(f"✅ indexed:  {label}")
+    
+    print(f"\n{len(HOT_QUERIES) - failures}/{len(HOT_QUERIES)} hot queries use an index")
+    return failures == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_indexes()) else 1)
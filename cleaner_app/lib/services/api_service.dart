@@ -86,18 +86,35 @@ class ApiService {
     }
   }
   
-  Future<Map<String, dynamic>> getCleanerJobs(String cleanerId) async {
-    try {
+  // Admin lists are paged; follow X-Next-Cursor until every row is loaded.
+  // Returns null if any page fails.
+  Future<List?> _getAllPages(String path, [Map<String, String> params = const {}]) async {
+    final rows = [];
+    String? after;
+    do {
       final response = await http.get(
-        Uri.parse('$baseUrl/admin/bookings'),
+        Uri.parse('$baseUrl$path').replace(queryParameters: {
+          ...params,
+          'limit': '500',
+          if (after != null) 'after': after,
+        }),
         headers: _headers,
       );
       
-      if (response.statusCode == 200) {
-        final allBookings = jsonDecode(response.body) as List;
-        final cleanerJobs = allBookings
-            .where((booking) => booking['cleaner_id'] == cleanerId)
-            .toList();
+      if (response.statusCode != 200) {
+        return null;
+      }
+      rows.addAll(jsonDecode(response.body) as List);
+      after = response.headers['x-next-cursor'];
+    } while (after != null);
+    return rows;
+  }
+  
+  Future<Map<String, dynamic>> getCleanerJobs(String cleanerId) async {
+    try {
+      final cleanerJobs = await _getAllPages('/admin/bookings', {'cleaner_id': cleanerId});
+      
+      if (cleanerJobs != null) {
         return {'success': true, 'data': cleanerJobs};
       } else {
         return {'success': false, 'error': 'Failed to load jobs'};
@@ -163,13 +180,10 @@ class ApiService {
   
   Future<Map<String, dynamic>> getAllCleaners() async {
     try {
-      final response = await http.get(
-        Uri.parse('$baseUrl/admin/cleaners'),
-        headers: _headers,
-      );
+      final cleaners = await _getAllPages('/admin/cleaners');
       
-      if (response.statusCode == 200) {
-        return {'success': true, 'data': jsonDecode(response.body)};
+      if (cleaners != null) {
+        return {'success': true, 'data': cleaners};
       } else {
         return {'success': false, 'error': 'Failed to load cleaners'};
       }
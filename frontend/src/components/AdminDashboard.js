@@ -41,6 +41,7 @@ import { useAuth } from '../contexts/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import InvoiceManagement from './InvoiceManagement';
 import PromoCodeManagement from './PromoCodeManagement';
+import { fetchAllPages } from '../lib/pagination';
 
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
@@ -52,9 +53,11 @@ const AdminDashboard = () => {
   const [isMobileMenuOpen, setIsMobileMenuOpen] = useState(false);
   const [stats, setStats] = useState({});
   const [bookings, setBookings] = useState([]);
+  const [bookingsCursor, setBookingsCursor] = useState(null);
   const [cleaners, setCleaners] = useState([]);
   const [faqs, setFAQs] = useState([]);
   const [tickets, setTickets] = useState([]);
+  const [ticketsCursor, setTicketsCursor] = useState(null);
   const [services, setServices] = useState([]);
   const [loading, setLoading] = useState(false);
 
@@ -160,10 +163,12 @@ const AdminDashboard = () => {
     }
   };
 
-  const loadBookings = async () => {
+  // Admin lists are paged; `after` is the X-Next-Cursor of the previous page
+  const loadBookings = async (after = null) => {
     try {
-      const response = await axios.get(`${API}/admin/bookings`);
-      setBookings(response.data);
+      const response = await axios.get(`${API}/admin/bookings`, { params: after ? { after } : {} });
+      setBookings(after ? [...bookings, ...response.data] : response.data);
+      setBookingsCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Failed to load bookings:', error);
     }
@@ -171,8 +176,7 @@ const AdminDashboard = () => {
 
   const loadCleaners = async () => {
     try {
-      const response = await axios.get(`${API}/admin/cleaners`);
-      setCleaners(response.data);
+      setCleaners(await fetchAllPages(`${API}/admin/cleaners`));
     } catch (error) {
       console.error('Failed to load cleaners:', error);
     }
@@ -180,17 +184,17 @@ const AdminDashboard = () => {
 
   const loadFAQs = async () => {
     try {
-      const response = await axios.get(`${API}/admin/faqs`);
-      setFAQs(response.data);
+      setFAQs(await fetchAllPages(`${API}/admin/faqs`));
     } catch (error) {
       console.error('Failed to load FAQs:', error);
     }
   };
 
-  const loadTickets = async () => {
+  const loadTickets = async (after = null) => {
     try {
-      const response = await axios.get(`${API}/admin/tickets`);
-      setTickets(response.data);
+      const response = await axios.get(`${API}/admin/tickets`, { params: after ? { after } : {} });
+      setTickets(after ? [...tickets, ...response.data] : response.data);
+      setTicketsCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       console.error('Failed to load tickets:', error);
     }
@@ -326,22 +330,19 @@ const AdminDashboard = () => {
   // Export function
   const exportBookings = async () => {
     try {
-      const response = await axios.get(`${API}/admin/export/bookings`);
-      const csvData = response.data.data;
-      
-      // Convert to CSV
-      const headers = Object.keys(csvData[0] || {});
-      const csvContent = [
-        headers.join(','),
-        ...csvData.map(row => headers.map(header => `"${row[header] || ''}"`).join(','))
-      ].join('\n');
+      // Server streams the CSV, so download the response body as-is
+      const response = await axios.get(`${API}/admin/export/bookings`, {
+        params: { format: 'csv' },
+        responseType: 'blob'
+      });
+      const disposition = response.headers['content-disposition'] || '';
+      const filenameMatch = disposition.match(/filename="([^"]+)"/);
 
       // Download file
-      const blob = new Blob([csvContent], { type: 'text/csv' });
-      const url = window.URL.createObjectURL(blob);
+      const url = window.URL.createObjectURL(response.data);
       const a = document.createElement('a');
       a.href = url;
-      a.download = response.data.filename;
+      a.download = filenameMatch ? filenameMatch[1] : 'bookings_export.csv';
       a.click();
       window.URL.revokeObjectURL(url);
       
@@ -433,19 +434,14 @@ const AdminDashboard = () => {
 
   const exportReport = async (type) => {
     try {
-      const response = await axios.get(`${API}/admin/reports/${type}/export`);
-      const csvData = response.data.data;
-      
-      // Convert to CSV
-      const headers = Object.keys(csvData[0] || {});
-      const csvContent = [
-        headers.join(','),
-        ...csvData.map(row => headers.map(header => `"${row[header] || ''}"`).join(','))
-      ].join('\n');
+      // Server streams the CSV, so download the response body as-is
+      const response = await axios.get(`${API}/admin/reports/${type}/export`, {
+        params: { format: 'csv' },
+        responseType: 'blob'
+      });
       
       // Download CSV
-      const blob = new Blob([csvContent], { type: 'text/csv' });
-      const url = window.URL.createObjectURL(blob);
+      const url = window.URL.createObjectURL(response.data);
       const link = document.createElement('a');
       link.href = url;
       link.download = `${type}_report_${new Date().toISOString().split('T')[0]}.csv`;
@@ -1243,6 +1239,13 @@ const AdminDashboard = () => {
                     </tbody>
                   </table>
                 </div>
+                {bookingsCursor && (
+                  <div className="flex justify-center p-4">
+                    <Button variant="outline" onClick={() => loadBookings(bookingsCursor)}>
+                      Load more bookings
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
           </TabsContent>
@@ -1540,6 +1543,13 @@ const AdminDashboard = () => {
                   </CardContent>
                 </Card>
               ))}
+              {ticketsCursor && (
+                <div className="flex justify-center">
+                  <Button variant="outline" onClick={() => loadTickets(ticketsCursor)}>
+                    Load more tickets
+                  </Button>
+                </div>
+              )}
             </div>
           </TabsContent>
         </Tabs>
@@ -141,6 +141,21 @@ const BookingFlow = ({ isGuest = false }) => {
     }
   }, [houseSize, frequency]);
 
+  // Re-price an applied promo when the order changes; scoped rules depend on the line items
+  useEffect(() => {
+    if (!appliedPromo || !houseSize || !frequency) return;
+    requestPromoQuote(appliedPromo.code)
+      .then((response) => {
+        if (response.data.promo_valid) {
+          setAppliedPromo({ code: response.data.promo_code, discount: response.data.discount_amount });
+        } else {
+          setAppliedPromo(null);
+          toast.error(response.data.promo_message || 'Promo code no longer applies');
+        }
+      })
+      .catch((error) => console.error('Failed to re-price promo code:', error));
+  }, [houseSize, frequency, selectedServices, aLaCarteCart]);
+
   const loadAllServices = async () => {
     try {
       const response = await axios.get(`${API}/services`);
@@ -261,22 +276,26 @@ const BookingFlow = ({ isGuest = false }) => {
     return subtotal;
   };
 
+  // The discount comes from the server quote, which knows service-scoped promo rules
   const calculateDiscount = (subtotal) => {
     if (!appliedPromo) return 0;
-    
-    let discount = 0;
-    if (appliedPromo.discount_type === 'percentage') {
-      discount = (subtotal * appliedPromo.discount_value) / 100;
-    } else {
-      discount = appliedPromo.discount_value;
-    }
-    
-    // Apply maximum discount limit if set
-    if (appliedPromo.maximum_discount_amount && discount > appliedPromo.maximum_discount_amount) {
-      discount = appliedPromo.maximum_discount_amount;
-    }
-    
-    return Math.min(discount, subtotal);
+    return Math.min(appliedPromo.discount, subtotal);
+  };
+
+  const requestPromoQuote = (code) => {
+    return axios.post(`${API}/quote`, {
+      house_size: houseSize,
+      frequency: frequency,
+      services: selectedServices.map(item => ({
+        service_id: item.serviceId,
+        quantity: item.quantity
+      })),
+      a_la_carte_services: aLaCarteCart.map(item => ({
+        service_id: item.serviceId,
+        quantity: item.quantity
+      })),
+      promo_code: code
+    });
   };
 
   const validatePromoCode = async () => {
@@ -287,16 +306,16 @@ const BookingFlow = ({ isGuest = false }) => {
 
     setPromoLoading(true);
     try {
-      const response = await axios.post(`${API}/validate-promo-code`, {
-        code: promoCode.trim().toUpperCase(),
-        subtotal: basePrice + getALaCarteTotal()
-      });
-
-      if (response.data.valid) {
-        setAppliedPromo(response.data.promo);
-        toast.success(`Promo code applied! You saved $${response.data.discount.toFixed(2)}`);
+      const response = await requestPromoQuote(promoCode.trim().toUpperCase());
+
+      if (response.data.promo_valid) {
+        setAppliedPromo({ code: response.data.promo_code, discount: response.data.discount_amount });
+        toast.success(`Promo code applied! You saved $${response.data.discount_amount.toFixed(2)}`);
+        if (response.data.promo_message) {
+          toast.info(response.data.promo_message);
+        }
       } else {
-        toast.error(response.data.message || 'Invalid promo code');
+        toast.error(response.data.promo_message || 'Invalid promo code');
         setAppliedPromo(null);
       }
     } catch (error) {
@@ -1129,10 +1148,7 @@ const BookingFlow = ({ isGuest = false }) => {
                                   {appliedPromo.code} Applied!
                                 </div>
                                 <div className="text-sm text-green-600">
-                                  {appliedPromo.discount_type === 'percentage' 
-                                    ? `${appliedPromo.discount_value}% off`
-                                    : `$${appliedPromo.discount_value} off`
-                                  }
+                                  ${appliedPromo.discount.toFixed(2)} off
                                 </div>
                               </div>
                             </div>
@@ -1146,9 +1162,6 @@ const BookingFlow = ({ isGuest = false }) => {
                               Remove
                             </Button>
                           </div>
-                          {appliedPromo.description && (
-                            <p className="text-sm text-gray-600">{appliedPromo.description}</p>
-                          )}
                         </div>
                       )}
                     </CardContent>
@@ -31,6 +31,7 @@ const API = `${BACKEND_URL}/api`;
 
 const PromoCodeManagement = () => {
   const [promoCodes, setPromoCodes] = useState([]);
+  const [promoCodesCursor, setPromoCodesCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [showCreateForm, setShowCreateForm] = useState(false);
   const [editingPromo, setEditingPromo] = useState(null);
@@ -56,11 +57,13 @@ const PromoCodeManagement = () => {
     loadPromoCodes();
   }, []);
 
-  const loadPromoCodes = async () => {
+  // Campaigns can add thousands of codes, so the list is paged; `after` is the previous X-Next-Cursor
+  const loadPromoCodes = async (after = null) => {
     try {
       setLoading(true);
-      const response = await axios.get(`${API}/admin/promo-codes`);
-      setPromoCodes(response.data);
+      const response = await axios.get(`${API}/admin/promo-codes`, { params: after ? { after } : {} });
+      setPromoCodes(after ? [...promoCodes, ...response.data] : response.data);
+      setPromoCodesCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       toast.error('Failed to load promo codes');
       console.error('Failed to load promo codes:', error);
@@ -346,6 +349,18 @@ const PromoCodeManagement = () => {
                         {promo.minimum_order_amount ? `$${promo.minimum_order_amount}` : 'No minimum'}
                       </div>
                     </div>
+                    <div>
+                      <span className="text-gray-500">Customers:</span>
+                      <div className="font-medium">{promo.unique_customers || 0}</div>
+                    </div>
+                    <div>
+                      <span className="text-gray-500">Total Discount:</span>
+                      <div className="font-medium">${(promo.total_discount || 0).toFixed(2)}</div>
+                    </div>
+                    <div>
+                      <span className="text-gray-500">Attributed Revenue:</span>
+                      <div className="font-medium">${(promo.attributed_revenue || 0).toFixed(2)}</div>
+                    </div>
                   </div>
                 </div>
                 
@@ -380,6 +395,13 @@ const PromoCodeManagement = () => {
           </Card>
         ))}
       </div>
+      {promoCodesCursor && (
+        <div className="flex justify-center p-4">
+          <Button variant="outline" onClick={() => loadPromoCodes(promoCodesCursor)}>
+            Load more promo codes
+          </Button>
+        </div>
+      )}
 
       {/* Create/Edit Promo Code Dialog */}
       <Dialog open={showCreateForm || editingPromo} onOpenChange={(open) => {
@@ -0,0 +1,18 @@
+import axios from 'axios';
+
+// Largest page the admin list endpoints serve (MAX_PAGE_SIZE on the backend)
+const PAGE_SIZE = 500;
+
+// Fetch every row of a paged admin list by following X-Next-Cursor
+export async function fetchAllPages(url, params = {}) {
+  const rows = [];
+  let after = null;
+  do {
+    const response = await axios.get(url, {
+      params: { ...params, limit: PAGE_SIZE, ...(after ? { after } : {}) }
+    });
+    rows.push(...response.data);
+    after = response.headers['x-next-cursor'] || null;
+  } while (after);
+  return rows;
+}
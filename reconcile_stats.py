@@ -0,0 +1,17 @@
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from server import reconcile_dashboard_counters
+
+async def reconcile_stats():
+    print("Rebuilding dashboard counters from bookings, cleaners and tickets...")
+    counters = await reconcile_dashboard_counters()
+    for key, value in counters.items():
+        if key != "_id":
+            print(f"  {key}: {value}")
+
+if __name__ == "__main__":
+    asyncio.run(reconcile_stats())
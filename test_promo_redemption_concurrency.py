@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Load test for promo code redemption
+Fires thousands of concurrent redemptions at one promo code and checks that
+neither the global usage_limit, the per-customer limit nor first_booking_only
+is overshot.
+Requires the MongoDB configured in backend/.env.
+"""
+
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from server import db, redeem_promo_code, promo_usage_key, PromoCode, prepare_for_mongo
+
+REDEMPTIONS = 5000
+
+async def hammer_promo(
+    usage_limit: Optional[int],
+    usage_limit_per_customer: Optional[int],
+    customers: int,
+    first_booking_only: bool = False
+):
+    """Race REDEMPTIONS redemptions spread over `customers` customers; return wins and the stored promo"""
+    promo = PromoCode(
+        code=f"LOADTEST{uuid.uuid4().hex[:8].upper()}",
+        discount_type="fixed",
+        discount_value=5.0,
+        usage_limit=usage_limit,
+        usage_limit_per_customer=usage_limit_per_customer,
+        first_booking_only=first_booking_only
+    )
+    await db.promo_codes.insert_one(prepare_for_mongo(promo.dict()))
+    try:
+        customer_ids = [f"loadtest-customer-{i % customers}" for i in range(REDEMPTIONS)]
+        rejections = await asyncio.gather(*[
+            redeem_promo_code(promo.id, customer_id, f"loadtest-booking-{i}")
+            for i, customer_id in enumerate(customer_ids)
+        ])
+        wins = [customer_id for customer_id, rejection in zip(customer_ids, rejections) if rejection is None]
+        stored = await db.promo_codes.find_one({"id": promo.id})
+        counters = await db.promo_customer_usage.find({"promo_code_id": promo.id}).to_list(None)
+        return wins, stored, counters
+    finally:
+        await db.promo_codes.delete_one({"id": promo.id})
+        await db.promo_customer_usage.delete_many({"promo_code_id": promo.id})
+        await db.first_bookings.delete_many({"_id": {"$regex": "^loadtest-customer-"}})
+
+def test_global_limit():
+    """A usage_limit=100 promo redeems exactly 100 times across distinct customers"""
+    print(f"🧪 Racing {REDEMPTIONS} redemptions of a usage_limit=100 promo")
+    wins, stored, counters = asyncio.run(hammer_promo(usage_limit=100, usage_limit_per_customer=1, customers=REDEMPTIONS))
+    
+    assert len(wins) == 100, f"expected 100 redemptions, got {len(wins)}"
+    assert stored["usage_count"] == 100, f"usage_count overshot: {stored['usage_count']}"
+    assert sum(counter["count"] for counter in counters) == 100
+    print("✅ Global limit held at 100")
+    return True
+
+def test_per_customer_limit():
+    """Each customer redeems at most usage_limit_per_customer times under contention"""
+    customers, per_customer = 50, 2
+    print(f"🧪 Racing {REDEMPTIONS} redemptions from {customers} customers, limit {per_customer} each")
+    wins, stored, counters = asyncio.run(hammer_promo(usage_limit=None, usage_limit_per_customer=per_customer, customers=customers))
+    
+    assert len(wins) == customers * per_customer, f"expected {customers * per_customer} redemptions, got {len(wins)}"
+    assert all(counter["count"] == per_customer for counter in counters), "a customer overshot their limit"
+    assert stored["usage_count"] == len(wins), "rejected redemptions must hand their global unit back"
+    assert {counter["_id"] for counter in counters} == {
+        promo_usage_key(stored["id"], f"loadtest-customer-{i}") for i in range(customers)
+    }
+    print(f"✅ {len(wins)} redemptions, {per_customer} per customer")
+    return True
+
+def test_first_booking_only():
+    """A first-booking-only promo redeems once per customer however many bookings race for it"""
+    customers = 50
+    print(f"🧪 Racing {REDEMPTIONS} first-booking-only redemptions from {customers} customers")
+    wins, stored, counters = asyncio.run(hammer_promo(
+        usage_limit=None, usage_limit_per_customer=None, customers=customers, first_booking_only=True
+    ))
+    
+    assert len(wins) == customers, f"expected {customers} redemptions, got {len(wins)}"
+    assert len(set(wins)) == customers, "a customer redeemed on more than one booking"
+    assert stored["usage_count"] == customers, "rejected redemptions must hand their global unit back"
+    assert all(counter["count"] == 1 for counter in counters), "rejected redemptions must hand their customer unit back"
+    print(f"✅ {len(wins)} first-booking redemptions, one per customer")
+    return True
+
+if __name__ == "__main__":
+    test_global_limit()
+    test_per_customer_limit()
+    test_first_booking_only()
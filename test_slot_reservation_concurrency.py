@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Concurrency test for time slot reservation
+Hammers a single time slot from hundreds of coroutines and checks that exactly
+as many reservations win as the slot has capacity. Requires the MongoDB
+configured in backend/.env.
+"""
+
+import asyncio
+import sys
+import uuid
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).parent / 'backend'))
+
+from server import (
+    db, get_crew_capacity, reserve_time_slot, release_time_slot, place_slot_hold, redeem_slot_hold,
+    TimeSlot, prepare_for_mongo
+)
+
+CONTENDERS = 500
+
+async def hammer_slot(capacity: Optional[int]):
+    """Race CONTENDERS reservations for one fresh slot and return the winning booking ids.
+
+    With capacity=None no slot document exists beforehand, so the first
+    reservations race to create it and the crew count is the capacity.
+    """
+    slot = TimeSlot(date="2099-01-01", time_slot=f"test-{uuid.uuid4().hex[:8]}", capacity=capacity)
+    if capacity is not None:
+        await db.time_slots.insert_one(prepare_for_mongo(slot.dict()))
+    try:
+        booking_ids = [f"booking-{i}" for i in range(CONTENDERS)]
+        results = await asyncio.gather(*[
+            reserve_time_slot(slot.date, slot.time_slot, booking_id)
+            for booking_id in booking_ids
+        ])
+        winners = [booking_id for booking_id, won in zip(booking_ids, results) if won]
+        
+        # A losing booking must not be able to release the winner's slot
+        loser = next(booking_id for booking_id in booking_ids if booking_id not in winners)
+        await release_time_slot(slot.date, slot.time_slot, loser)
+        stored = await db.time_slots.find_one({"date": slot.date, "time_slot": slot.time_slot})
+        
+        return winners, stored
+    finally:
+        await db.time_slots.delete_one({"date": slot.date, "time_slot": slot.time_slot})
+
+def test_single_winner():
+    """Exactly one of CONTENDERS concurrent reservations succeeds on a capacity-1 slot"""
+    print(f"🧪 Racing {CONTENDERS} reservations for one single-crew time slot")
+    winners, stored = asyncio.run(hammer_slot(capacity=1))
+    
+    assert len(winners) == 1, f"expected exactly one winner, got {len(winners)}"
+    assert stored["is_available"] is False
+    assert stored["reserved"] == 1
+    assert stored["booking_ids"] == winners
+    print(f"✅ Single winner: {winners[0]}")
+    return True
+
+def test_capacity_winners():
+    """A slot with capacity N accepts exactly N of CONTENDERS concurrent reservations"""
+    capacity = 8
+    print(f"🧪 Racing {CONTENDERS} reservations for a time slot with capacity {capacity}")
+    winners, stored = asyncio.run(hammer_slot(capacity=capacity))
+    
+    assert len(winners) == capacity, f"expected {capacity} winners, got {len(winners)}"
+    assert stored["is_available"] is False
+    assert stored["reserved"] == capacity
+    assert sorted(stored["booking_ids"]) == sorted(winners)
+    print(f"✅ {len(winners)} winners for capacity {capacity}")
+    return True
+
+def test_virtual_slot_winners():
+    """Racing the first reservations of an unbooked template slot creates one counter and honours crew capacity"""
+    crew_capacity = asyncio.run(get_crew_capacity())
+    print(f"🧪 Racing {CONTENDERS} first reservations for an unbooked slot (crew capacity {crew_capacity})")
+    winners, stored = asyncio.run(hammer_slot(capacity=None))
+    
+    assert len(winners) == crew_capacity, f"expected {crew_capacity} winners, got {len(winners)}"
+    assert stored["reserved"] == crew_capacity
+    assert sorted(stored["booking_ids"]) == sorted(winners)
+    assert stored["id"] and stored["created_at"]
+    print(f"✅ {len(winners)} winners for an unbooked slot")
+    return True
+
+async def hold_then_book():
+    """Hold a capacity-1 slot, race other bookings against it, then convert the hold"""
+    slot = TimeSlot(date="2099-01-01", time_slot=f"test-{uuid.uuid4().hex[:8]}", capacity=1)
+    await db.time_slots.insert_one(prepare_for_mongo(slot.dict()))
+    try:
+        hold = await place_slot_hold(slot.date, slot.time_slot, "test-holder", "127.0.0.1")
+        second_hold = await place_slot_hold(slot.date, slot.time_slot, "test-rival", "127.0.0.1")
+        rivals = await asyncio.gather(*[
+            reserve_time_slot(slot.date, slot.time_slot, f"rival-{i}")
+            for i in range(CONTENDERS)
+        ])
+        bogus = await redeem_slot_hold(slot.date, slot.time_slot, "no-such-hold", "test-holder", "bogus")
+        stolen = await redeem_slot_hold(slot.date, slot.time_slot, hold.id, "test-rival", "thief")
+        converted = await redeem_slot_hold(slot.date, slot.time_slot, hold.id, "test-holder", "holder")
+        stored = await db.time_slots.find_one({"id": slot.id})
+        hold_record = await db.slot_holds.find_one({"id": hold.id})
+        return second_hold, rivals, bogus or stolen, converted, stored, hold_record
+    finally:
+        await db.time_slots.delete_one({"id": slot.id})
+        await db.slot_holds.delete_many({"date": slot.date, "time_slot": slot.time_slot})
+
+def test_hold_blocks_rivals():
+    """A checkout hold counts against capacity and converts into the reservation"""
+    print(f"🧪 Racing {CONTENDERS} bookings against a held single-crew time slot")
+    second_hold, rivals, bogus, converted, stored, hold_record = asyncio.run(hold_then_book())
+    
+    assert second_hold is None, "a full slot must not accept a second hold"
+    assert not any(rivals), "no rival booking may take a held slot"
+    assert not bogus, "an unknown or someone else's hold must not convert"
+    assert converted, "the holder's booking must convert its hold"
+    assert stored["reserved"] == 1
+    assert stored["booking_ids"] == ["holder"]
+    assert stored["holds"] == []
+    assert hold_record is None
+    print("✅ Hold kept the slot for its holder")
+    return True
+
+if __name__ == "__main__":
+    test_single_winner()
+    test_capacity_winners()
+    test_virtual_slot_winners()
+    test_hold_blocks_rivals()